@@ -0,0 +1,218 @@
+# benchmark.py - Headless performance benchmarks for the soundboard playback path.
+# Replaces 'sounddevice' with a null output backend whose streams pull callbacks as fast
+# as possible, so it runs on machines without audio hardware (CI, Linux servers).
+#
+# Usage: python benchmark.py [--quick] [--only decode,trigger,mixer,populate] [--output results.json]
+
+import sys
+import os
+import json
+import time
+import types
+import shutil
+import platform
+import tempfile
+import argparse
+import threading
+import statistics
+
+# --- Null Audio Backend ---
+def install_null_sounddevice(samplerate=48000, channels=2, blocksize=512):
+    """Registers a fake 'sounddevice' module. Must run before soundboard is imported."""
+    import numpy as np
+
+    class PortAudioError(Exception): pass
+    class CallbackStop(Exception): pass
+    class CallbackAbort(Exception): pass
+
+    device_info = {'name': 'Null Output', 'index': 0, 'hostapi': 0, 'max_input_channels': 0,
+                   'max_output_channels': channels, 'default_samplerate': float(samplerate)}
+
+    def query_devices(device=None, kind=None):
+        if device is None and kind is None: return [dict(device_info)]
+        return dict(device_info)
+
+    class NullOutputStream:
+        """Calls the audio callback back-to-back on a thread instead of at the device's pace."""
+        def __init__(self, samplerate=None, blocksize=None, device=None, channels=None, dtype=None, latency=None, callback=None, finished_callback=None, **kwargs):
+            self.samplerate = samplerate; self.blocksize = blocksize or module.NULL_BLOCKSIZE; self.channels = channels
+            self.callback = callback; self.finished_callback = finished_callback
+            self.active = False; self.closed = False; self.blocks = 0; self._thread = None
+        def start(self):
+            self.active = True; self._thread = threading.Thread(target=self._run, daemon=True); self._thread.start()
+        def _run(self):
+            outdata = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+            while self.active:
+                try: self.callback(outdata, self.blocksize, None, None)
+                except CallbackStop: break
+                self.blocks += 1
+                time.sleep(0) # Yield the GIL so producer threads can queue voices
+            self.active = False
+            if self.finished_callback: self.finished_callback()
+        def stop(self):
+            self.active = False
+            if self._thread and self._thread is not threading.current_thread(): self._thread.join(timeout=1.0)
+        def close(self): self.stop(); self.closed = True
+        def abort(self): self.stop()
+        def __enter__(self): self.start(); return self
+        def __exit__(self, *exc): self.close()
+
+    module = types.ModuleType("sounddevice")
+    module.PortAudioError = PortAudioError; module.CallbackStop = CallbackStop; module.CallbackAbort = CallbackAbort
+    module.OutputStream = NullOutputStream; module.query_devices = query_devices
+    module.default = types.SimpleNamespace(device=(None, 0), samplerate=None)
+    module._initialize = lambda: None; module._terminate = lambda: None
+    module.NULL_BLOCKSIZE = blocksize
+    sys.modules["sounddevice"] = module
+    return module
+
+# --- Helpers ---
+def _timed(func, repeats):
+    """Runs func `repeats` times, returns the list of wall times in seconds."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter(); func(); times.append(time.perf_counter() - start)
+    return times
+
+def _summary(times_s):
+    return {"runs": len(times_s), "median_ms": statistics.median(times_s) * 1000.0, "min_ms": min(times_s) * 1000.0, "max_ms": max(times_s) * 1000.0}
+
+def _test_signal(np, seconds, samplerate=44100, channels=2):
+    t = np.arange(int(seconds * samplerate)) / float(samplerate)
+    tone = 0.4 * np.sin(2 * np.pi * 440.0 * t) + 0.1 * np.sin(2 * np.pi * 1234.5 * t)
+    return np.stack([tone] * channels, axis=1).astype(np.float32)
+
+# --- Benchmarks ---
+def bench_decode(sb, work_dir, quick):
+    """Decode throughput per file format through the soundboard's decoder."""
+    import numpy as np
+    import soundfile as sf
+    seconds = 5.0 if quick else 20.0; repeats = 3 if quick else 10
+    signal = _test_signal(np, seconds)
+    formats = {"wav": ("WAV", "PCM_16"), "flac": ("FLAC", "PCM_16"), "ogg": ("OGG", "VORBIS"), "mp3": ("MP3", "MPEG_LAYER_III")}
+    results = {}
+    for ext, (sf_format, subtype) in formats.items():
+        path = os.path.join(work_dir, f"decode_test.{ext}")
+        try: sf.write(path, signal, 44100, format=sf_format, subtype=subtype)
+        except Exception as e: results[ext] = {"error": f"could not create test file: {e}"}; continue
+        try:
+            decoded = sb.decode_audio_file(path) # Warm-up run, also validates the format is decodable
+            times = _timed(lambda: sb.decode_audio_file(path), repeats)
+        except Exception as e: results[ext] = {"error": f"{type(e).__name__}: {e}"}; continue
+        median_s = statistics.median(times)
+        results[ext] = dict(_summary(times), audio_seconds=seconds, file_bytes=os.path.getsize(path),
+                            realtime_factor=seconds / median_s, decoded_mb_per_s=decoded.nbytes / 1048576.0 / median_s)
+        decoder = getattr(decoded, "decoder", None)
+        if decoder: results[ext]["decoder"] = decoder
+        if hasattr(sb, "convert_audio_format"): # 44.1k stereo -> 48k stereo, the cache-time conversion for a typical device
+            results[ext]["convert_to_48k"] = _summary(_timed(lambda: sb.convert_audio_format(decoded, 48000, 2), repeats))
+    return results
+
+def bench_trigger(sb, work_dir, quick):
+    """Latency from queueing a cached sound on the mixer to its first mixed block."""
+    import numpy as np
+    import soundfile as sf
+    triggers = 50 if quick else 300
+    path = os.path.join(work_dir, "trigger_test.wav"); sf.write(path, _test_signal(np, 0.5), 48000)
+    engine = sb.MixerEngine(); out_format = engine.output_format("Default")
+    sb.SAMPLE_CACHE.get_or_render(path, [], out_format=out_format) # Measure the cached path only
+    sb.LATENCY_STATS.reset()
+    try:
+        for _ in range(triggers):
+            trace = sb.TriggerTrace("bench", "benchmark"); trace.mark("play_internal")
+            decoded = sb.SAMPLE_CACHE.get_or_render(path, [], trace, out_format)
+            engine.play("Default", decoded, 1.0, "bench", 0, trace)
+            time.sleep(0.002)
+        time.sleep(0.2)
+    finally:
+        engine.close()
+    summary = sb.LATENCY_STATS.summary()
+    return {"triggers": triggers, "stages_ms": {stage: {k: v for k, v in st.items() if k != "histogram"} for stage, st in summary.items()},
+            "total_histogram": summary.get("total", {}).get("histogram", {})}
+
+def bench_mixer(sb, work_dir, quick):
+    """Audio callback cost as a function of the number of simultaneous voices."""
+    import numpy as np
+    frames = 512; samplerate = 48000; blocks = 200 if quick else 2000
+    block_budget_us = frames / float(samplerate) * 1e6
+    audio = sb.DecodedAudio(_test_signal(np, 30.0, samplerate), samplerate)
+    results = {}
+    for voice_count in (1, 4, 16, 32, 64):
+        mixer = sb.MixerStream(None); mixer.stream.close() # Stop the null stream thread, the callback is driven directly below
+        for i in range(voice_count): mixer.add_voice(sb.Voice(f"v{i}", audio.samples, 0.5 / voice_count, audio.peak))
+        outdata = np.zeros((frames, mixer.channels), dtype=np.float32)
+        mixer._callback(outdata, frames, None, None) # Admit voices outside the timed loop
+        per_block = []
+        for _ in range(blocks):
+            start = time.perf_counter(); mixer._callback(outdata, frames, None, None); per_block.append(time.perf_counter() - start)
+        median_us = statistics.median(per_block) * 1e6
+        results[str(voice_count)] = {"median_us": median_us, "p99_us": sorted(per_block)[int(0.99 * (len(per_block) - 1))] * 1e6,
+                                     "realtime_load_pct": median_us / block_budget_us * 100.0}
+    return {"frames_per_block": frames, "samplerate": samplerate, "block_budget_us": block_budget_us, "voices": results}
+
+def bench_populate(sb, work_dir, quick):
+    """populate_groups_and_sounds time as a function of library size, and the cost of one incremental edit."""
+    from PySide6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    sb.get_script_directory = lambda: work_dir # Keep the benchmark's config.json out of the real app directory
+    window = sb.SoundboardWindow(); window.preloader.cancel(); window._stop_hotkey_listener(); window.file_check_timer.stop()
+    sizes = (50, 250) if quick else (100, 500, 1000, 2500); repeats = 2 if quick else 3
+    groups = [{"id": "default", "name": "Default"}] + [{"id": f"group_{g}", "name": f"Group {g}"} for g in range(1, 8)]
+    results = {}
+    try:
+        for size in sizes:
+            window.config["groups"] = groups
+            window.config["sounds"] = [{"id": f"snd_bench_{i}", "name": f"Bench Sound {i:05d}", "relative_path": f"missing/bench_{i}.wav",
+                                        "absolute_path": os.path.join(work_dir, "missing", f"bench_{i}.wav"), "file_exists": False,
+                                        "volume": 1.0, "group_id": groups[i % len(groups)]["id"], "hotkey": None, "effects": []} for i in range(size)]
+            def populate():
+                window.populate_groups_and_sounds(); app.processEvents()
+            results[str(size)] = _summary(_timed(populate, repeats))
+            if hasattr(window, "sync_sound_view"): # Incremental update after a single rename, vs. the full rebuild above
+                visible = [snd for snd in window.config["sounds"] if snd["group_id"] == "default"] # Only the current tab is built
+                edited = visible[len(visible) // 2]; names = iter(range(10 ** 6))
+                def edit_one():
+                    n = next(names); edited["name"] = f"{'Aa' if n % 2 else 'Zz'} Edited Sound {n}" # Moves it to the other end of the sorted grid every time
+                    window.sync_sound_view(); app.processEvents()
+                results[str(size)]["edit_one"] = _summary(_timed(edit_one, repeats))
+    finally:
+        window.audio_engine.close(); window.deleteLater(); app.processEvents()
+    return results
+
+BENCHMARKS = {"decode": bench_decode, "trigger": bench_trigger, "mixer": bench_mixer, "populate": bench_populate}
+
+# --- Main Execution ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless soundboard benchmarks (null audio backend, JSON output).")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations and smaller inputs")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="Comma-separated subset of: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    install_null_sounddevice()
+    real_stdout = sys.stdout; sys.stdout = sys.stderr # The app logs with print(), keep stdout clean for JSON
+    import numpy
+    import soundboard as sb
+
+    work_dir = tempfile.mkdtemp(prefix="soundboard_bench_")
+    results = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), "platform": platform.platform(),
+                        "numpy": numpy.__version__, "backend": "null", "quick": args.quick}, "results": {}}
+    try:
+        for name in [n.strip() for n in args.only.split(",") if n.strip()]:
+            if name not in BENCHMARKS: print(f"Unknown benchmark '{name}', skipping."); continue
+            print(f"[Benchmark] Running '{name}'...")
+            start = time.perf_counter()
+            try: results["results"][name] = BENCHMARKS[name](sb, work_dir, args.quick)
+            except Exception as e:
+                import traceback; traceback.print_exc(); results["results"][name] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"[Benchmark] '{name}' finished in {time.perf_counter() - start:.2f}s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        sys.stdout = real_stdout
+
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: f.write(output + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else: print(output)
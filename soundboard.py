@@ -7,11 +7,23 @@ import sys
 import os
 import json
 import threading
+import queue
 import time
+import math
+import struct
+import hashlib
+import tempfile
+import select
 from functools import partial
 import copy
+import re
+import bisect
+import difflib
 import traceback
 import uuid
+from collections import OrderedDict, deque, namedtuple
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 
 # --- PySide6 Imports ---
 try:
@@ -21,7 +33,7 @@ try:
         QPushButton, QLabel, QLineEdit, QGridLayout, QScrollArea, QTabWidget,
         QDialog, QSlider, QComboBox, QDialogButtonBox, QFileDialog, QMenu,
         QStyleFactory, QMessageBox, QMenuBar, QInputDialog, QListWidget, QListWidgetItem,
-        QSpinBox, QCheckBox, QDoubleSpinBox
+        QSpinBox, QCheckBox, QDoubleSpinBox, QProgressDialog
     )
     # Added QMetaObject, Q_ARG, Signal, QThread
     from PySide6.QtCore import Qt, QTimer, QSize, QMetaObject, Slot, Q_ARG, QPoint, QThread, Signal
@@ -83,9 +95,14 @@ except ImportError: pass
 
 # --- Configuration ---
 CONFIG_FILENAME = "config.json"
+AUDIO_CACHE_DIRNAME = "audio_cache" # Decoded device-format PCM, next to config.json
+VOICE_STEAL_POLICIES = [("oldest", "Steal Oldest"), ("quietest", "Steal Quietest"), ("reject", "Reject New")]
+RETRIGGER_MODES = [("overlap", "Overlap"), ("restart", "Restart"), ("ignore", "Ignore While Playing"), ("toggle", "Toggle Stop")]
 DEFAULT_CONFIG = {
     "version": "1.0",
-    "settings": { "scan_interval_minutes": 15, "output_device_name": "Default", "stop_all_hotkey": None, "grid_columns": 5 },
+    "settings": { "scan_interval_minutes": 15, "output_device_name": "Default", "stop_all_hotkey": None, "grid_columns": 5, "sample_cache_mb": 256,
+                  "max_voices": 32, "voice_steal_policy": "oldest", "stream_threshold_seconds": 30,
+                  "preload_workers": 2, "disk_cache_mb": 1024, "tab_unload_minutes": 10 },
     "groups": [ {"id": "default", "name": "Default"} ],
     "sounds": []
 }
@@ -103,20 +120,1388 @@ def get_script_directory():
         return app_dir
     except Exception as e: print(f"FATAL: Could not determine application directory: {e}"); return None
 
+# --- Audio Decoding & Sample Cache ---
+class DecodedAudio:
+    """Normalized float32 PCM (frames x channels) ready for playback. Samples are read-only."""
+    __slots__ = ('samples', 'sample_rate', 'nbytes', 'peak', 'decoder')
+    def __init__(self, samples, sample_rate, decoder=None, peak=None):
+        samples.setflags(write=False) # Shared between voices, must never be modified in place
+        self.samples = samples; self.sample_rate = sample_rate; self.nbytes = samples.nbytes
+        if peak is None: peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+        self.peak = peak # Used by the 'quietest' voice stealing policy
+        self.decoder = decoder # Which decoder produced the samples ("soundfile" / "pydub"), for diagnostics
+
+def probe_stream_duration(file_path):
+    """Returns the duration in seconds if soundfile can stream the file block-wise, else None."""
+    try: info = sf.info(file_path)
+    except Exception: return None # Not a libsndfile format (e.g. AAC/M4A), needs a full pydub decode
+    return info.frames / float(info.samplerate) if info.samplerate else None
+
+_PYDUB_SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32} if _AUDIO_LIBS_LOADED else {}
+
+def _decode_with_soundfile(file_path):
+    """In-process decode straight to float32 frames x channels (WAV/FLAC/OGG/AIFF, MP3 on libsndfile >= 1.1)."""
+    samples, sample_rate = sf.read(file_path, dtype='float32', always_2d=True)
+    return DecodedAudio(np.ascontiguousarray(samples), sample_rate, "soundfile")
+
+def _decode_with_pydub(file_path):
+    """Decode through pydub/ffmpeg for formats libsndfile cannot read (AAC/M4A/WMA...)."""
+    audio_segment = AudioSegment.from_file(file_path)
+    dtype = _PYDUB_SAMPLE_DTYPES.get(audio_segment.sample_width)
+    # View the raw PCM without copying, then make the single float32 copy and normalize it in place to [-1.0, 1.0]
+    if dtype is not None: samples = np.frombuffer(audio_segment.raw_data, dtype=dtype).astype(np.float32)
+    else: samples = np.array(audio_segment.get_array_of_samples(), dtype=np.float32) # Unusual sample width, let pydub unpack it
+    samples *= 1.0 / (2**(audio_segment.sample_width * 8 - 1))
+    # Reshape for multi-channel, ensuring it's 2D even for mono (treat 0 channels as mono)
+    samples = samples.reshape((-1, max(1, audio_segment.channels)))
+    return DecodedAudio(samples, audio_segment.frame_rate, "pydub")
+
+def decode_audio_file(file_path):
+    """Decodes an audio file to a DecodedAudio, trying soundfile first and falling back to pydub/ffmpeg.
+       Raises FileNotFoundError / CouldntDecodeError.
+    """
+    if not os.path.exists(file_path): raise FileNotFoundError(f"Audio file not found: {file_path}")
+    try: return _decode_with_soundfile(file_path)
+    except Exception as e: print(f"[Decode] soundfile cannot read '{os.path.basename(file_path)}' ({e}), falling back to pydub.")
+    return _decode_with_pydub(file_path)
+
+def probe_audio_file(file_path):
+    """Checks that a file decodes and returns its format as {"duration", "channels", "sample_rate", "decoder"}.
+       soundfile formats only decode their first block; others need a full pydub/ffmpeg decode. Raises like decode_audio_file,
+       and ValueError for files that decode to no audio (zero frames or channels).
+    """
+    if not os.path.exists(file_path): raise FileNotFoundError(f"Audio file not found: {file_path}")
+    try:
+        info = sf.info(file_path)
+        if info.frames > 0: sf.read(file_path, frames=4096, dtype='float32', always_2d=True) # Header alone doesn't prove the data decodes
+        result = {"duration": info.frames / float(info.samplerate), "channels": info.channels, "sample_rate": info.samplerate, "decoder": "soundfile"}
+    except Exception: # Not readable by libsndfile, let pydub decide
+        audio_segment = AudioSegment.from_file(file_path)
+        result = {"duration": len(audio_segment) / 1000.0, "channels": audio_segment.channels, "sample_rate": audio_segment.frame_rate, "decoder": "pydub"}
+    if result["duration"] <= 0 or not result["channels"] or not result["sample_rate"]: raise ValueError("File contains no audio (zero frames or channels)")
+    return result
+
+def effects_signature(effects):
+    """Canonical string for the enabled effects of a sound, or None if it plays dry."""
+    if not pedalboard or not hasattr(pedalboard, 'Pedalboard'): return None
+    enabled = [{"type": fx.get("type"), "params": dict(fx.get("params", {}))} for fx in (effects or []) if fx.get("enabled", False)]
+    return json.dumps(enabled, sort_keys=True) if enabled else None
+
+def build_effects_board(effects):
+    """Builds a Pedalboard from the enabled effects, or returns None if there is nothing to apply."""
+    if not pedalboard or not hasattr(pedalboard, 'Pedalboard'): return None
+    board = pedalboard.Pedalboard([])
+    for fx_cfg in effects or []:
+        if not fx_cfg.get("enabled", False): continue
+        fx_type = fx_cfg.get("type"); params = fx_cfg.get("params", {})
+        try:
+            if hasattr(pedalboard, fx_type): board.append(getattr(pedalboard, fx_type)(**params)); print(f"[Effects] Added effect: {fx_type} with params {params}")
+            else: print(f"[Effects] Warn: Unknown or unavailable effect type '{fx_type}'")
+        except Exception as e: print(f"[Effects] Error creating effect '{fx_type}' with params {params}: {e}"); traceback.print_exc()
+    return board if len(board) > 0 else None
+
+def render_effects(decoded, effects):
+    """Runs decoded audio through a Pedalboard built from the enabled effects; returns a new DecodedAudio."""
+    board = build_effects_board(effects)
+    if board is None: return decoded # Only process if effects were actually added
+    try: processed = board(decoded.samples, decoded.sample_rate); print(f"[Effects] Rendered {board}")
+    except Exception as e: print(f"[Effects] Error applying effects: {e}"); traceback.print_exc(); return decoded # Fallback to dry samples
+    if processed.ndim == 1: processed = processed.reshape(-1, 1)
+    return DecodedAudio(np.ascontiguousarray(processed, dtype=np.float32), decoded.sample_rate, decoded.decoder)
+
+class PolyphaseResampler:
+    """Kaiser-windowed sinc resampler for a rational rate ratio, evaluated with vectorized polyphase filters.
+       Stateful: feed blocks through process() and call flush() once at the end of the input.
+    """
+    HALF_TAPS = 16; MAX_PHASES = 1024; CHUNK_FRAMES = 8192; KAISER_BETA = 8.6; ROLLOFF = 0.94
+    _tables = {} # (up, down) -> (half_width, phase filter table, period matrix or None), shared by all instances
+
+    def __init__(self, src_rate, dst_rate, channels):
+        g = math.gcd(int(src_rate), int(dst_rate)); self.up = int(dst_rate) // g; self.down = int(src_rate) // g
+        self.half, self.table, self.matrix = self._filters(self.up, self.down)
+        self.phases = len(self.table); self.offsets = np.arange(-(self.half - 1), self.half + 1)
+        self._buf = np.zeros((self.half - 1, channels), dtype=np.float32); self._buf_start = -(self.half - 1) # Input index of _buf[0]
+        self._in_count = 0; self._out_count = 0
+
+    @classmethod
+    def _filters(cls, up, down):
+        filters = cls._tables.get((up, down))
+        if filters is None:
+            ratio = up / float(down); half = int(math.ceil(cls.HALF_TAPS * max(1.0, 1.0 / ratio))) # Wider filter when decimating
+            cutoff = 0.5 * min(1.0, ratio) * cls.ROLLOFF # Cycles per input sample
+            phases = min(up, cls.MAX_PHASES)
+            dist = np.arange(-(half - 1), half + 1)[None, :] - (np.arange(phases) / float(phases))[:, None]
+            window = np.i0(cls.KAISER_BETA * np.sqrt(np.clip(1.0 - (dist / half) ** 2, 0.0, 1.0))) / np.i0(cls.KAISER_BETA)
+            taps = 2.0 * cutoff * np.sinc(2.0 * cutoff * dist) * window
+            table = (taps / taps.sum(axis=1, keepdims=True)).astype(np.float32) # Unity gain at DC for every phase
+            matrix = None
+            if up <= cls.MAX_PHASES:
+                # Every `up` outputs consume exactly `down` inputs, so one period is a fixed (up x segment) matrix product
+                matrix = np.zeros((up, down + 2 * half - 1), dtype=np.float32)
+                for r in range(up): matrix[r, (r * down) // up:(r * down) // up + 2 * half] = table[(r * down) % up]
+            filters = cls._tables[(up, down)] = (half, table, matrix)
+        return filters
+
+    def process(self, block):
+        if len(block): self._buf = np.concatenate([self._buf, block.astype(np.float32, copy=False)]); self._in_count += len(block)
+        return self._drain(None)
+
+    def flush(self):
+        self._buf = np.concatenate([self._buf, np.zeros((self.half, self._buf.shape[1]), dtype=np.float32)])
+        return self._drain(-(-self._in_count * self.up // self.down)) # ceil(in * up / down) frames in total
+
+    def _drain(self, limit):
+        buf_end = self._buf_start + len(self._buf)
+        max_base = buf_end - 1 - self.half # Last input frame whose full filter window is buffered
+        end = -(-(max_base + 1) * self.up // self.down) if max_base >= 0 else 0
+        if limit is not None: end = min(end, limit)
+        start = self._out_count; out = []
+        first_period = -(-start // self.up); last_period = min(end // self.up, (buf_end - self.half) // self.down)
+        if self.matrix is not None and last_period > first_period:
+            out.append(self._gather(start, first_period * self.up))
+            segment_len = self.matrix.shape[1]; periods_per_chunk = max(1, (self.CHUNK_FRAMES * 128) // segment_len) # Bounds the copy below
+            all_segments = np.lib.stride_tricks.sliding_window_view(self._buf, segment_len, axis=0) # (frames, channels, segment)
+            for period in range(first_period, last_period, periods_per_chunk):
+                segment_start = period * self.down - (self.half - 1) - self._buf_start; periods = min(periods_per_chunk, last_period - period)
+                segments = all_segments[segment_start:segment_start + (periods - 1) * self.down + 1:self.down]
+                segments = np.ascontiguousarray(segments.transpose(1, 0, 2)) # (channels, periods, segment), contiguous for BLAS
+                out.append((segments @ self.matrix.T).transpose(1, 2, 0).reshape(-1, self._buf.shape[1])) # (periods * up, channels)
+            out.append(self._gather(last_period * self.up, end))
+        elif end > start: out.append(self._gather(start, end))
+        self._out_count = max(self._out_count, end)
+        keep_from = (self._out_count * self.down) // self.up - (self.half - 1) - self._buf_start # Drop input no longer needed
+        if keep_from > 0: self._buf = self._buf[keep_from:]; self._buf_start += keep_from
+        out = [o for o in out if len(o)]
+        if not out: return np.zeros((0, self._buf.shape[1]), dtype=np.float32)
+        return np.ascontiguousarray(np.concatenate(out) if len(out) > 1 else out[0], dtype=np.float32)
+
+    def _gather(self, start, end):
+        """Computes outputs [start, end) frame by frame; used for partial periods and very large phase counts."""
+        out = []
+        for chunk_start in range(start, end, self.CHUNK_FRAMES):
+            n = np.arange(chunk_start, min(end, chunk_start + self.CHUNK_FRAMES), dtype=np.int64) * self.down
+            base = n // self.up; phase = (n % self.up) * self.phases // self.up
+            frames = self._buf[base[:, None] + self.offsets[None, :] - self._buf_start] # (chunk, taps, channels)
+            out.append(np.einsum('nk,nkc->nc', self.table[phase], frames))
+        if not out: return np.zeros((0, self._buf.shape[1]), dtype=np.float32)
+        return np.concatenate(out) if len(out) > 1 else out[0]
+
+def remix_channels(samples, channels):
+    """Maps frames x N samples to the output channel count (mono is duplicated, extra channels are averaged down or dropped)."""
+    src_channels = samples.shape[1]
+    if src_channels == channels: return samples
+    if channels == 1: return samples.mean(axis=1, keepdims=True, dtype=np.float32)
+    if src_channels == 1: return np.repeat(samples, channels, axis=1)
+    if src_channels > channels: return np.ascontiguousarray(samples[:, :channels]) # e.g. 5.1 -> front left/right
+    return np.concatenate([samples, np.zeros((len(samples), channels - src_channels), dtype=np.float32)], axis=1)
+
+def convert_audio_format(decoded, sample_rate, channels):
+    """Returns decoded resampled and remixed to (sample_rate, channels); a no-op if it already matches."""
+    samples = decoded.samples
+    if decoded.sample_rate == sample_rate and samples.shape[1] == channels: return decoded
+    if channels < samples.shape[1]: samples = remix_channels(samples, channels) # Fewer channels to resample
+    if decoded.sample_rate != sample_rate and len(samples):
+        resampler = PolyphaseResampler(decoded.sample_rate, sample_rate, samples.shape[1])
+        samples = np.concatenate([resampler.process(samples), resampler.flush()])
+    samples = remix_channels(samples, channels)
+    return DecodedAudio(np.ascontiguousarray(samples, dtype=np.float32), sample_rate, decoded.decoder)
+
+class DiskAudioCache:
+    """Persistent cache of converted audio in AUDIO_CACHE_DIRNAME, so a restart reads files instead of decoding them.
+       Each entry is a 64-byte header followed by raw little-endian float32 frames, read into RAM in one go (not
+       memory-mapped: a mapped page faulting in from disk inside the audio callback would block the mixer).
+       File names are a hash of the SampleCache key (path, mtime, size, effects signature, output format), so edited
+       files simply stop matching; stale entries age out when the size cap is enforced (oldest access first).
+    """
+    MAGIC = b"LSBPCM01"; HEADER = struct.Struct("<8sIHHQf16s"); HEADER_SIZE = 64; SUFFIX = ".pcm"; TEMP_SUFFIX = ".tmp"
+
+    def __init__(self):
+        self.directory = None; self.cap_bytes = 0; self.used_bytes = 0
+        self.hits = 0; self.misses = 0; self.writes = 0; self.evictions = 0
+        self._lock = threading.Lock(); self._writer = None
+        self._generation = 0 # Bumped by purge(); writes queued before it are dropped
+
+    def configure(self, directory, cap_bytes):
+        with self._lock:
+            self.cap_bytes = max(0, int(cap_bytes))
+            if directory != self.directory:
+                self.directory = directory
+                stale = [path for path, _, _ in self._scan_locked(self.TEMP_SUFFIX) if self._remove(path)] # Left behind by a crash mid-write
+                if stale: print(f"[DiskCache] Removed {len(stale)} stale temporary file(s).")
+                self.used_bytes = sum(size for _, _, size in self._scan_locked())
+            if self.cap_bytes > 0 and self._writer is None: self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diskcache")
+            self._evict_locked()
+
+    def enabled(self): return self.directory is not None and self.cap_bytes > 0
+
+    def _path_for(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + self.SUFFIX)
+
+    def load(self, key):
+        """Returns the cached DecodedAudio for key, or None if it isn't cached on disk. Reads on the calling (worker) thread."""
+        if not self.enabled(): return None
+        path = self._path_for(key)
+        try: f = open(path, 'rb')
+        except FileNotFoundError:
+            with self._lock: self.misses += 1
+            return None
+        except OSError as e: print(f"[DiskCache] Could not read {path}: {e}"); return None
+        try:
+            with f:
+                magic, sample_rate, channels, _, frames, peak, decoder = self.HEADER.unpack_from(f.read(self.HEADER_SIZE))
+                if magic != self.MAGIC or os.fstat(f.fileno()).st_size != self.HEADER_SIZE + frames * channels * 4: raise ValueError("bad header or truncated data")
+                f.seek(self.HEADER_SIZE)
+                samples = np.fromfile(f, dtype='<f4', count=frames * channels).astype(np.float32, copy=False).reshape(frames, channels)
+            os.utime(path) # Recently used, evicted last
+        except Exception as e:
+            print(f"[DiskCache] Dropping unreadable entry {os.path.basename(path)}: {e}"); self._remove(path)
+            with self._lock: self.misses += 1
+            return None
+        with self._lock: self.hits += 1
+        return DecodedAudio(samples, sample_rate, decoder.rstrip(b"\0").decode('ascii', 'replace') or None, peak)
+
+    def store(self, key, audio):
+        """Writes audio to disk on the background writer thread; the caller never waits for the disk."""
+        writer = self._writer
+        if writer is None or not self.enabled() or audio.nbytes > self.cap_bytes: return
+        try: writer.submit(self._write, self._path_for(key), audio, self._generation)
+        except RuntimeError: pass # Writer shut down during exit
+
+    def _write(self, path, audio, generation):
+        directory = os.path.dirname(path); tmp_path = None
+        if generation != self._generation: return # Queued before a purge
+        try:
+            os.makedirs(directory, exist_ok=True)
+            frames, channels = audio.samples.shape
+            header = self.HEADER.pack(self.MAGIC, int(audio.sample_rate), channels, 0, frames, audio.peak, (audio.decoder or "").encode('ascii', 'replace')[:16])
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=self.TEMP_SUFFIX)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header.ljust(self.HEADER_SIZE, b"\0")); f.write(np.ascontiguousarray(audio.samples, dtype='<f4').data)
+            os.replace(tmp_path, path); tmp_path = None # Atomic: readers never see a half-written entry
+            with self._lock:
+                self.used_bytes += self.HEADER_SIZE + audio.nbytes; self.writes += 1
+                self._evict_locked()
+        except Exception as e: print(f"[DiskCache] Could not write {path}: {e}")
+        finally:
+            if tmp_path: self._remove(tmp_path)
+
+    def _scan_locked(self, suffix=SUFFIX):
+        """(path, atime/mtime, size) of every cache entry (or, with TEMP_SUFFIX, unfinished write) on disk."""
+        if not self.directory or not os.path.isdir(self.directory): return []
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(suffix):
+                        st = entry.stat(); entries.append((entry.path, st.st_mtime, st.st_size))
+        except OSError as e: print(f"[DiskCache] Could not scan {self.directory}: {e}")
+        return entries
+
+    def _evict_locked(self):
+        if self.used_bytes <= self.cap_bytes: return
+        entries = sorted(self._scan_locked(), key=lambda e: e[1]) # Least recently used first
+        self.used_bytes = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if self.used_bytes <= self.cap_bytes: break
+            if self._remove(path): self.used_bytes -= size; self.evictions += 1
+
+    @staticmethod
+    def _remove(path):
+        try: os.remove(path); return True
+        except OSError: return False # e.g. still open on Windows, retried on the next eviction
+
+    def purge(self):
+        """Deletes every cache entry; returns (files removed, bytes freed). Writes queued before the purge are dropped."""
+        with self._lock: self._generation += 1
+        writer = self._writer
+        if writer is not None: # Let the write in progress land first, so it can't reappear after the purge
+            try: writer.submit(lambda: None).result()
+            except RuntimeError: pass # Writer shut down during exit
+        with self._lock:
+            removed = 0; freed = 0
+            for path, _, size in self._scan_locked() + self._scan_locked(self.TEMP_SUFFIX):
+                if self._remove(path): removed += 1; freed += size
+            self.used_bytes = sum(size for _, _, size in self._scan_locked())
+            return removed, freed
+
+    def close(self):
+        if self._writer is not None: self._writer.shutdown(wait=True); self._writer = None # Finish pending writes
+
+    def stats(self):
+        with self._lock:
+            return {"directory": self.directory, "used_bytes": self.used_bytes, "cap_bytes": self.cap_bytes,
+                    "hits": self.hits, "misses": self.misses, "writes": self.writes, "evictions": self.evictions}
+
+DISK_CACHE = DiskAudioCache()
+
+class SampleCache:
+    """Process-wide LRU cache of decoded audio, bounded by a byte budget.
+       Entries are keyed by (absolute path, mtime, size, effects signature, output format) so edited or replaced
+       files are never served stale; dry audio uses a None signature, effect renders are cached next to it.
+    """
+    def __init__(self, budget_bytes=0):
+        self._entries = OrderedDict(); self._lock = threading.Lock()
+        self.budget_bytes = budget_bytes; self.used_bytes = 0
+        self.hits = 0; self.misses = 0; self.evictions = 0
+        self._decoders = {} # Absolute path -> decoder used the last time it was decoded, survives eviction
+        self._durations = {} # Absolute path -> (file_key, probe_stream_duration result), so triggers don't reopen the file
+
+    @staticmethod
+    def file_key(file_path):
+        st = os.stat(file_path) # Raises FileNotFoundError if the file is gone
+        return (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None: self.misses += 1; return None
+            self._entries.move_to_end(key); self.hits += 1
+            return entry
+
+    def put(self, key, audio):
+        with self._lock:
+            if audio.nbytes > self.budget_bytes: return # Too large (or cache disabled), don't thrash the cache
+            old = self._entries.pop(key, None)
+            if old is not None: self.used_bytes -= old.nbytes
+            self._entries[key] = audio; self.used_bytes += audio.nbytes
+            self._evict_locked()
+
+    def get_or_render(self, file_path, effects, trace=None, out_format=None):
+        """Returns cached audio for file_path with its enabled effects applied and converted to out_format
+           ((sample_rate, channels) of the output device, None keeps the source format), rendering it on a miss.
+           Only the final result is cached; device-format results are also persisted to DISK_CACHE and read back from it.
+           Marks the 'decoded', 'effects' and 'converted' stages on trace if one is given.
+        """
+        fx_sig = effects_signature(effects)
+        key = self.file_key(file_path) + (fx_sig, out_format)
+        audio = self.get(key)
+        if audio is None and out_format is not None: # Only device-format audio is persisted
+            audio = DISK_CACHE.load(key)
+            if audio is not None: self.record_decoder(file_path, f"disk cache ({audio.decoder})"); self.put(key, audio)
+        if audio is not None:
+            if trace is not None: trace.mark("decoded"); trace.mark("effects")
+        else:
+            audio = decode_audio_file(file_path); self.record_decoder(file_path, audio.decoder)
+            if trace is not None: trace.mark("decoded")
+            if fx_sig is not None: audio = render_effects(audio, effects)
+            if trace is not None: trace.mark("effects")
+            if out_format is not None: audio = convert_audio_format(audio, *out_format); DISK_CACHE.store(key, audio)
+            self.put(key, audio)
+        if trace is not None: trace.mark("converted")
+        return audio
+
+    def stream_duration(self, file_path):
+        """probe_stream_duration, remembered per file_key: a repeat costs one os.stat instead of opening and parsing the file."""
+        try: key = self.file_key(file_path)
+        except OSError: return None # Missing file, left for the decode path to report
+        with self._lock: cached = self._durations.get(key[0])
+        if cached is not None and cached[0] == key: return cached[1]
+        duration = probe_stream_duration(file_path)
+        with self._lock: self._durations[key[0]] = (key, duration)
+        return duration
+
+    def remember_stream_duration(self, file_path, duration):
+        """Seeds stream_duration with a result probed elsewhere (None when soundfile can't stream the file)."""
+        try: key = self.file_key(file_path)
+        except OSError: return
+        with self._lock: self._durations[key[0]] = (key, duration)
+
+    def record_decoder(self, file_path, decoder):
+        with self._lock: self._decoders[os.path.abspath(file_path)] = decoder
+
+    def decoder_for(self, file_path):
+        """Returns the decoder last used for file_path ("soundfile" / "pydub"), or None if it was never decoded."""
+        with self._lock: return self._decoders.get(os.path.abspath(file_path))
+
+    def discard_render(self, file_path, fx_sig):
+        """Drops cached renders of file_path for an effects signature that is no longer used."""
+        if not file_path or fx_sig is None: return
+        abs_path = os.path.abspath(file_path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == abs_path and k[3] == fx_sig]:
+                self.used_bytes -= self._entries.pop(key).nbytes
+
+    def set_budget(self, budget_bytes):
+        with self._lock:
+            self.budget_bytes = max(0, int(budget_bytes)); self._evict_locked()
+
+    def clear(self):
+        with self._lock: self._entries.clear(); self.used_bytes = 0; self._decoders.clear(); self._durations.clear()
+
+    def _evict_locked(self):
+        while self.used_bytes > self.budget_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False) # Least recently used first
+            self.used_bytes -= evicted.nbytes; self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            decoders = {}
+            for decoder in self._decoders.values(): decoders[decoder] = decoders.get(decoder, 0) + 1
+            return {"entries": len(self._entries), "used_bytes": self.used_bytes, "budget_bytes": self.budget_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions, "decoders": decoders}
+
+SAMPLE_CACHE = SampleCache(DEFAULT_CONFIG["settings"]["sample_cache_mb"] * 1024 * 1024)
+
+class LibraryPreloader:
+    """Warms the sample cache in the background on a bounded thread pool, in the order jobs are given.
+       Each start() gets its own run state, so jobs of a cancelled run that are still finishing never count towards the next one.
+    """
+    def __init__(self, progress_callback=None):
+        self.progress_callback = progress_callback # Called as (done, total, stop_reason) from worker threads; stop_reason is "" or "budget"
+        self._executor = None; self._lock = threading.Lock()
+        self._run = {'done': 0, 'total': 0, 'cancel': threading.Event()} # The current run
+
+    def start(self, jobs, max_workers=2, stream_threshold=0, out_format=None):
+        """jobs: list of (sound_id, file_path, effects) in priority order. out_format: (sample_rate, channels) to cache in."""
+        self.cancel()
+        run = self._run = {'done': 0, 'total': len(jobs), 'cancel': threading.Event()}
+        if not jobs: return
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="warmup")
+        for job in jobs: self._executor.submit(self._warm_one, job, stream_threshold, out_format, run)
+        print(f"[Preload] Warming {len(jobs)} sounds with {max(1, max_workers)} workers...")
+
+    def _warm_one(self, job, stream_threshold, out_format, run):
+        sound_id, file_path, effects = job; cancel_event = run['cancel']
+        try:
+            if cancel_event.is_set(): return
+            stats = SAMPLE_CACHE.stats()
+            if stats["used_bytes"] >= stats["budget_bytes"] * 0.9: # Cache nearly full, warming more would only evict hot sounds
+                with self._lock: first = not cancel_event.is_set(); cancel_event.set(); done = run['done']
+                if first: # One final update, later jobs of this run report nothing
+                    print("[Preload] Sample cache budget reached, stopping warm-up.")
+                    if self.progress_callback: self.progress_callback(done, run['total'], "budget")
+                return
+            duration = SAMPLE_CACHE.stream_duration(file_path) if stream_threshold > 0 else None
+            if duration is not None and duration > stream_threshold: return # Streamed at play time, never cached
+            SAMPLE_CACHE.get_or_render(file_path, effects, out_format=out_format)
+        except Exception as e: print(f"[Preload] Could not warm {sound_id} ({file_path}): {e}")
+        finally:
+            with self._lock: run['done'] += 1; done = run['done']
+            if self.progress_callback and not cancel_event.is_set(): self.progress_callback(done, run['total'], "")
+
+    def is_running(self):
+        run = self._run
+        return self._executor is not None and not run['cancel'].is_set() and run['done'] < run['total']
+
+    def cancel(self):
+        """Stops queued jobs; jobs already decoding finish but report no further progress."""
+        self._run['cancel'].set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True); self._executor = None
+
+class ImportProber:
+    """Probes files picked for import (probe_audio_file) on a bounded thread pool, so broken files are caught before they're added."""
+    def __init__(self, result_callback):
+        self.result_callback = result_callback # Called as (batch, path, info, error) from worker threads; info is None on failure
+        self._executor = None; self._cancel_event = threading.Event(); self.batch = 0
+
+    def start(self, paths, max_workers=4):
+        """Probes paths in the background and returns the batch number its results are tagged with."""
+        self.cancel()
+        self.batch += 1; self._cancel_event = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="import")
+        for path in paths: self._executor.submit(self._probe_one, self.batch, path, self._cancel_event)
+        return self.batch
+
+    def _probe_one(self, batch, path, cancel_event):
+        if cancel_event.is_set(): return
+        info = error = None
+        try:
+            info = probe_audio_file(path)
+            SAMPLE_CACHE.remember_stream_duration(path, info["duration"] if info["decoder"] == "soundfile" else None) # First trigger skips its own probe
+        except Exception as e: error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        if not cancel_event.is_set(): self.result_callback(batch, path, info, error)
+
+    def cancel(self):
+        """Drops queued probes; probes already running finish without reporting."""
+        self._cancel_event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True); self._executor = None
+
+# --- Latency Instrumentation ---
+class TriggerTrace:
+    """Monotonic (perf_counter) timestamps for each stage of a single trigger."""
+    STAGES = ("key_event", "play_internal", "decoded", "effects", "converted", "queued", "first_block")
+    __slots__ = ('sound_id', 'source', 'stamps')
+    def __init__(self, sound_id, source, key_event_time=None):
+        self.sound_id = sound_id; self.source = source; self.stamps = {}
+        if key_event_time is not None: self.stamps["key_event"] = key_event_time
+    def mark(self, stage, when=None): self.stamps[stage] = time.perf_counter() if when is None else when
+
+class LatencyStats:
+    """Aggregates TriggerTraces into per-stage latency samples with percentiles and a histogram."""
+    HISTOGRAM_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+    MAX_SAMPLES = 1000 # Per stage, oldest samples are dropped
+
+    def __init__(self):
+        self._lock = threading.Lock(); self._samples = {}
+
+    def record(self, trace):
+        """Stores the time spent in each stage of a finished trace (from the previous recorded stage)."""
+        previous = None
+        with self._lock:
+            for stage in TriggerTrace.STAGES:
+                stamp = trace.stamps.get(stage)
+                if stamp is None: continue
+                if previous is not None: self._samples.setdefault(stage, deque(maxlen=self.MAX_SAMPLES)).append((stamp - previous) * 1000.0)
+                previous = stamp
+            first = next((trace.stamps[st] for st in TriggerTrace.STAGES if st in trace.stamps), None)
+            if first is not None and previous is not None: self._samples.setdefault("total", deque(maxlen=self.MAX_SAMPLES)).append((previous - first) * 1000.0)
+
+    def reset(self):
+        with self._lock: self._samples.clear()
+
+    def summary(self):
+        """Returns {stage: {count, p50, p95, p99, max, histogram}} with times in milliseconds."""
+        with self._lock: samples = {stage: sorted(values) for stage, values in self._samples.items()}
+        result = {}
+        for stage in TriggerTrace.STAGES[1:] + ("total",):
+            values = samples.get(stage)
+            if not values: continue
+            pct = lambda q: values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+            histogram = {}; edge_index = 0
+            for v in values: # values are sorted, so walk the bucket edges once
+                while edge_index < len(self.HISTOGRAM_EDGES_MS) and v > self.HISTOGRAM_EDGES_MS[edge_index]: edge_index += 1
+                label = f"<={self.HISTOGRAM_EDGES_MS[edge_index]}ms" if edge_index < len(self.HISTOGRAM_EDGES_MS) else f">{self.HISTOGRAM_EDGES_MS[-1]}ms"
+                histogram[label] = histogram.get(label, 0) + 1
+            result[stage] = {"count": len(values), "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99), "max": values[-1], "histogram": histogram}
+        return result
+
+LATENCY_STATS = LatencyStats()
+
+# --- Mixer Engine ---
+class AudioEventRing:
+    """Single-producer / single-consumer ring of (code, arg, value) events with preallocated slots.
+       The audio callback pushes without locks or printing; a non-real-time thread drains it and does the logging.
+    """
+    STATUS = 1; STEAL = 2; REJECT = 3; FIRST_BLOCK = 4; UNDERRUN = 5; CHOKE = 6; STREAM_ERROR = 7
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self._codes = [0] * capacity; self._args = [None] * capacity; self._values = [0] * capacity
+        self._head = 0; self._tail = 0 # _head is only written by the producer, _tail only by the consumer
+        self.dropped = 0
+
+    def push(self, code, arg=None, value=0):
+        head = self._head; next_head = (head + 1) % self.capacity
+        if next_head == self._tail: self.dropped += 1; return False # Full: drop rather than block the audio thread
+        self._codes[head] = code; self._args[head] = arg; self._values[head] = value
+        self._head = next_head # Publish only after the slot is written
+        return True
+
+    def drain(self):
+        events = []; tail = self._tail; head = self._head
+        while tail != head:
+            events.append((self._codes[tail], self._args[tail], self._values[tail])); self._args[tail] = None
+            tail = (tail + 1) % self.capacity
+        self._tail = tail
+        return events
+
+class Voice:
+    """One playing instance of a sound inside a MixerStream. Owned by the audio callback once queued."""
+    __slots__ = ('sound_id', 'samples', 'gain', 'level', 'max_voices', 'retrigger', 'choke_group', 'position', 'total_frames', 'stopped', 'trace')
+    def __init__(self, sound_id, samples, gain, peak=1.0, max_voices=0, trace=None, retrigger="overlap", choke_group=None):
+        self.sound_id = sound_id; self.samples = samples; self.gain = float(gain)
+        self.level = self.gain * peak; self.max_voices = max_voices # Per-sound polyphony limit, 0 = global limit only
+        self.retrigger = retrigger; self.choke_group = choke_group or None # See RETRIGGER_MODES; voices sharing a choke group cut each other
+        self.position = 0; self.total_frames = len(samples); self.stopped = False
+        self.trace = trace # TriggerTrace, completed when the first block is mixed
+    def stop(self): self.stopped = True # Picked up by the callback on its next block
+
+    def mix_into(self, outdata, frames, scratch, events):
+        """Adds the next block of this voice to outdata, using the preallocated scratch buffer. Runs in the audio callback."""
+        chunk = min(frames, self.total_frames - self.position)
+        if chunk > 0:
+            gained = np.multiply(self.samples[self.position:self.position + chunk], self.gain, out=scratch[:chunk]) # Same format as the stream
+            np.add(outdata[:chunk], gained, out=outdata[:chunk])
+            self.position += chunk
+        if self.position >= self.total_frames: self.stopped = True
+
+class StreamingVoice(Voice):
+    """A voice for long files: a reader thread decodes blocks ahead of the callback into a small bounded buffer."""
+    __slots__ = ('file_path', '_blocks', '_current', '_offset', '_reader_done', 'error')
+    BLOCK_FRAMES = 4096; READ_AHEAD_BLOCKS = 8
+    READER_POLL_SECONDS = 0.01 # How often a reader with a full read-ahead buffer checks whether the callback consumed a block
+
+    def __init__(self, sound_id, file_path, gain, max_voices=0, trace=None, retrigger="overlap", choke_group=None):
+        super().__init__(sound_id, np.zeros((0, 1), dtype=np.float32), gain, 1.0, max_voices, trace, retrigger, choke_group)
+        self.file_path = file_path; self.total_frames = -1 # Unknown until the reader reaches the end
+        self._blocks = deque() # Appended by the reader, popped by the callback; both lock-free
+        self._current = None; self._offset = 0; self._reader_done = False
+        self.error = None # Set by the reader; reported through the event ring once the callback reaches it
+
+    def start_reader(self, out_rate, out_channels, effects=None):
+        threading.Thread(target=self._reader_func, args=(out_rate, out_channels, effects), daemon=True).start()
+
+    def _reader_func(self, out_rate, out_channels, effects):
+        try:
+            with sf.SoundFile(self.file_path) as f:
+                resampler = PolyphaseResampler(f.samplerate, out_rate, f.channels) if f.samplerate != out_rate else None
+                board = build_effects_board(effects)
+                blocks = f.blocks(blocksize=self.BLOCK_FRAMES, dtype='float32', always_2d=True)
+                if resampler: blocks = self._resampled(blocks, resampler)
+                for block in blocks:
+                    if not len(block): continue
+                    if board is not None: block = board(block, out_rate, reset=False)
+                    block = remix_channels(block, out_channels)
+                    while len(self._blocks) >= self.READ_AHEAD_BLOCKS: # Buffer full: poll instead of having the callback signal a lock
+                        if self.stopped: return
+                        time.sleep(self.READER_POLL_SECONDS)
+                    if self.stopped: return
+                    self._blocks.append(block)
+        except Exception as e:
+            if not os.path.exists(self.file_path): e = FileNotFoundError(f"Audio file not found: {self.file_path}") # libsndfile only says "System error"
+            self.error = e; print(f"[Stream-{self.sound_id}] Error streaming '{self.file_path}': {e}")
+        finally:
+            self._reader_done = True
+
+    @staticmethod
+    def _resampled(blocks, resampler):
+        for block in blocks: yield resampler.process(block)
+        yield resampler.flush() # Filter tail
+
+    def mix_into(self, outdata, frames, scratch, events):
+        written = 0
+        while written < frames:
+            if self._current is None:
+                if not self._blocks:
+                    if self._reader_done:
+                        self.stopped = True; self.total_frames = self.position
+                        if self.error is not None: events.push(AudioEventRing.STREAM_ERROR, self.sound_id, self.error)
+                    elif self.position: events.push(AudioEventRing.UNDERRUN, self.sound_id, frames - written) # Not before the first block: the reader is still starting
+                    return # Underrun: leave the rest of this block silent and keep the voice alive
+                self._current = self._blocks.popleft(); self._offset = 0
+            chunk = min(frames - written, len(self._current) - self._offset)
+            gained = np.multiply(self._current[self._offset:self._offset + chunk], self.gain, out=scratch[:chunk])
+            np.add(outdata[written:written + chunk], gained, out=outdata[written:written + chunk])
+            written += chunk; self._offset += chunk; self.position += chunk
+            if self._offset >= len(self._current): self._current = None
+
+class MixerStream:
+    """A single long-lived output stream whose callback sums every active voice into the output block.
+       The callback only does arithmetic on preallocated buffers; diagnostics go through an AudioEventRing.
+    """
+    SCRATCH_FRAMES = 8192 # Largest block expected from PortAudio; larger blocks grow the buffer once
+
+    def __init__(self, device_index):
+        self.device_index = device_index
+        device_info = sd.query_devices(device_index, 'output')
+        self.samplerate = int(device_info['default_samplerate'])
+        self.channels = max(1, min(2, int(device_info['max_output_channels'])))
+        self._voices = [] # Only touched by the audio callback, in admission order (oldest first)
+        self._pending = deque() # New voices, handed to the callback lock-free
+        self.max_voices = 0; self.steal_policy = "oldest" # Global polyphony limit, 0 = unlimited
+        self.failed = False
+        self.events = AudioEventRing() # Drained by MixerEngine's logger thread, never printed from the callback
+        self._scratch = np.zeros((self.SCRATCH_FRAMES, self.channels), dtype=np.float32) # Per-voice gain buffer, reused every block
+        self.stream = sd.OutputStream(samplerate=self.samplerate, device=device_index, channels=self.channels, dtype=np.float32, callback=self._callback, finished_callback=self._on_finished)
+        self.stream.start()
+        print(f"[Mixer] Opened {self.channels}-ch output stream @ {self.samplerate}Hz on device index {device_index}")
+
+    def add_voice(self, voice): self._pending.append(voice)
+
+    def voices(self): return list(self._voices) + list(self._pending)
+
+    def stop_all(self):
+        for voice in self.voices(): voice.stop()
+
+    def close(self):
+        self.stop_all()
+        try: self.stream.close()
+        except Exception as e: print(f"[Mixer] Error closing stream on device {self.device_index}: {e}")
+
+    def _on_finished(self):
+        # A long-lived stream only finishes when closed or when the device went away
+        self.failed = True
+        print(f"[Mixer] Output stream on device index {self.device_index} finished.")
+
+    def _callback(self, outdata, frames, time_info, status):
+        if status: self.events.push(AudioEventRing.STATUS, status)
+        while self._pending: self._admit(self._pending.popleft())
+        outdata.fill(0)
+        voices = self._voices
+        if not voices: return
+        if frames > len(self._scratch): self._scratch = np.zeros((frames, self.channels), dtype=np.float32)
+        alive = 0
+        for voice in voices: # Mix, then compact finished voices out of the list in place
+            if not voice.stopped: voice.mix_into(outdata, frames, self._scratch, self.events)
+            if not voice.stopped: voices[alive] = voice; alive += 1
+        del voices[alive:]
+        np.clip(outdata, -1.0, 1.0, out=outdata)
+
+    def _admit(self, voice):
+        """Adds a queued voice, enforcing its retrigger mode, choke group and the voice limits.
+           Runs in the audio callback, so it only walks the voice list: no temporary lists, sorting or trace bookkeeping.
+        """
+        if voice.stopped: return
+        if voice.retrigger != "overlap":
+            found = False
+            for v in self._voices:
+                if v.sound_id != voice.sound_id or v.stopped: continue
+                found = True
+                if voice.retrigger == "ignore": break
+                v.stopped = True # 'restart' and 'toggle' both cut what is playing...
+            if found and voice.retrigger != "restart": voice.stopped = True; return # ...but a toggle doesn't start it again
+        if voice.choke_group is not None:
+            for v in self._voices:
+                if v.choke_group == voice.choke_group and v.sound_id != voice.sound_id and not v.stopped:
+                    v.stopped = True; self.events.push(AudioEventRing.CHOKE, v.sound_id, voice.sound_id)
+        if voice.max_voices > 0 and not self._make_room(voice.max_voices, voice, voice.sound_id): return
+        if self.max_voices > 0 and not self._make_room(self.max_voices, voice): return
+        self._voices.append(voice)
+        if voice.trace is not None: self.events.push(AudioEventRing.FIRST_BLOCK, voice.trace, time.perf_counter()); voice.trace = None # Stamped and recorded by the logger
+
+    def _make_room(self, limit, new_voice, sound_id=None):
+        """Stops playing voices (of sound_id, or any sound) until one slot below `limit` is free. Returns False if new_voice was rejected."""
+        playing = 0
+        for v in self._voices:
+            if not v.stopped and (sound_id is None or v.sound_id == sound_id): playing += 1
+        excess = playing - limit + 1
+        if excess <= 0: return True
+        if self.steal_policy == "reject":
+            new_voice.stopped = True; self.events.push(AudioEventRing.REJECT, new_voice.sound_id, limit)
+            return False
+        for _ in range(excess):
+            victim = None
+            for v in self._voices: # Oldest first; 'quietest' keeps looking for a lower level (ties steal the oldest)
+                if v.stopped or (sound_id is not None and v.sound_id != sound_id): continue
+                if victim is None or v.level < victim.level: victim = v
+                if self.steal_policy != "quietest": break
+            if victim is None: break
+            victim.stopped = True; self.events.push(AudioEventRing.STEAL, victim.sound_id, limit)
+        return True
+
+    def log_events(self, on_stream_error=None):
+        """Drains the event ring: prints what the callback could not and records latency traces. Not real-time.
+           on_stream_error(sound_id, exception) is called for streamed files whose reader failed.
+        """
+        for code, arg, value in self.events.drain():
+            if code == AudioEventRing.FIRST_BLOCK: arg.mark("first_block", value); LATENCY_STATS.record(arg)
+            elif code == AudioEventRing.STATUS: print(f"[Mixer] Stream status on device {self.device_index}: {arg}")
+            elif code == AudioEventRing.STEAL: print(f"[Mixer] Voice limit reached ({value}), stole {self.steal_policy} voice of {arg}")
+            elif code == AudioEventRing.REJECT: print(f"[Mixer] Voice limit reached ({value}), rejected new voice for {arg}")
+            elif code == AudioEventRing.UNDERRUN: print(f"[Mixer] Stream underrun for {arg}: {value} frames of silence")
+            elif code == AudioEventRing.CHOKE: print(f"[Mixer] Choke group: {value} cut {arg}")
+            elif code == AudioEventRing.STREAM_ERROR:
+                print(f"[Mixer] Streaming {arg} failed: {value}")
+                if on_stream_error: on_stream_error(arg, value)
+
+class OutputDeviceResolver:
+    """Maps the configured output device name to a PortAudio index, caching it until invalidated."""
+    def __init__(self):
+        self._lock = threading.Lock(); self._cached = None # (device_name, device_index)
+        self.resolve_count = 0; self.last_resolve_ms = None; self.last_invalidation = None
+
+    def resolve(self, device_name):
+        """Returns the output device index for device_name (None = system default)."""
+        with self._lock:
+            if self._cached is not None and self._cached[0] == device_name: return self._cached[1]
+            start = time.perf_counter(); device_index = None
+            if device_name and device_name != "Default":
+                try:
+                    for i, dev in enumerate(sd.query_devices()):
+                        if dev['name'] == device_name and dev['max_output_channels'] > 0: device_index = i; break
+                    else: print(f"[Devices] Warn: Output device '{device_name}' not found/available. Using default.")
+                except Exception as e_dev: print(f"[Devices] Error querying audio devices: {e_dev}. Using default."); traceback.print_exc()
+            self.last_resolve_ms = (time.perf_counter() - start) * 1000.0; self.resolve_count += 1
+            self._cached = (device_name, device_index)
+            print(f"[Devices] Resolved output device '{device_name}' -> index {device_index} in {self.last_resolve_ms:.2f} ms")
+            return device_index
+
+    def invalidate(self, reason):
+        with self._lock:
+            if self._cached is not None: print(f"[Devices] Device cache invalidated ({reason}).")
+            self._cached = None; self.last_invalidation = reason
+
+    def stats(self):
+        with self._lock:
+            return {"cached_device": self._cached[0] if self._cached else None, "cached_index": self._cached[1] if self._cached else None,
+                    "resolve_count": self.resolve_count, "last_resolve_ms": self.last_resolve_ms, "last_invalidation": self.last_invalidation}
+
+class MixerEngine:
+    """Keeps one MixerStream per output device; triggering a sound is just queueing a Voice."""
+    LOG_INTERVAL_SECONDS = 0.05
+
+    def __init__(self):
+        self._streams = {}; self._lock = threading.Lock()
+        self.max_voices = 0; self.steal_policy = "oldest"
+        self.devices = OutputDeviceResolver()
+        self.stream_error_callback = None # (sound_id, exception) for failed streamed files, called from the logger thread
+        self._logger_thread = None; self._logger_stop = threading.Event()
+        self._rescanning = False # Set while PortAudio is being re-initialized; no stream may be opened meanwhile
+
+    def set_polyphony(self, max_voices, steal_policy):
+        with self._lock:
+            self.max_voices = max(0, int(max_voices)); self.steal_policy = steal_policy
+            for mixer in self._streams.values(): mixer.max_voices = self.max_voices; mixer.steal_policy = self.steal_policy
+
+    def get_stream(self, device_name):
+        """Returns the mixer for the named output device, (re)opening its stream if needed. Raises PortAudioError during a device rescan."""
+        if self._rescanning: raise sd.PortAudioError("Audio devices are being rescanned, try again in a moment")
+        with self._lock: # Resolved under the lock so a rescan can't swap PortAudio out between resolving and opening
+            device_index = self.devices.resolve(device_name)
+            mixer = self._streams.get(device_index)
+            if mixer is not None and mixer.failed: # Device went away or stream died: re-resolve and reopen
+                mixer.close(); mixer.log_events(self.stream_error_callback); mixer = None; del self._streams[device_index]
+                self.devices.invalidate("output stream stopped unexpectedly"); device_index = self.devices.resolve(device_name)
+                mixer = self._streams.get(device_index)
+            if mixer is None:
+                try: mixer = MixerStream(device_index)
+                except sd.PortAudioError: self.devices.invalidate("failed to open output stream"); raise # Stale index, next trigger re-resolves
+                self._streams[device_index] = mixer
+                mixer.max_voices = self.max_voices; mixer.steal_policy = self.steal_policy
+            if self._logger_thread is None:
+                self._logger_stop = threading.Event()
+                self._logger_thread = threading.Thread(target=self._logger_func, args=(self._logger_stop,), name="mixer-events", daemon=True)
+                self._logger_thread.start()
+            return mixer
+
+    def _logger_func(self, stop_event):
+        """Non-real-time side of the mixers' event rings."""
+        while not stop_event.wait(self.LOG_INTERVAL_SECONDS): self.log_events()
+
+    def log_events(self):
+        with self._lock: # Also keeps this the only consumer of each ring
+            for mixer in self._streams.values(): mixer.log_events(self.stream_error_callback)
+
+    def rescan_devices(self):
+        """Re-enumerates PortAudio devices (picks up hotplugged ones). Closes open streams first.
+           The engine lock is held throughout, so no stream is opened or logged against a half-initialized PortAudio.
+        """
+        self._logger_stop.set()
+        with self._lock:
+            self._rescanning = True
+            try:
+                self._close_locked()
+                start = time.perf_counter()
+                try: sd._terminate(); sd._initialize() # PortAudio only refreshes its device list on re-initialization
+                except Exception as e: print(f"[Devices] Error re-initializing PortAudio: {e}")
+                self.devices.invalidate("rescan requested")
+            finally: self._rescanning = False
+        return (time.perf_counter() - start) * 1000.0
+
+    def output_format(self, device_name):
+        """(sample_rate, channels) of the device's mixer stream, the format sounds should be cached in."""
+        mixer = self.get_stream(device_name)
+        return (mixer.samplerate, mixer.channels)
+
+    def play(self, device_name, audio, gain, sound_id, max_voices=0, trace=None, retrigger="overlap", choke_group=None):
+        """Queues DecodedAudio on the device's mixer stream and returns the Voice.
+           audio should already be in the stream's output_format(); anything else is converted here, off the audio thread.
+        """
+        mixer = self.get_stream(device_name)
+        if audio.sample_rate != mixer.samplerate or audio.samples.shape[1] != mixer.channels:
+            print(f"[Mixer] Converting {audio.samples.shape[1]}-ch @ {audio.sample_rate}Hz audio for '{sound_id}' at trigger time (not cached in device format).")
+            audio = convert_audio_format(audio, mixer.samplerate, mixer.channels)
+        voice = Voice(sound_id, audio.samples, gain, audio.peak, max_voices, trace, retrigger, choke_group)
+        if trace is not None: trace.mark("queued")
+        mixer.add_voice(voice)
+        return voice
+
+    def play_stream(self, device_name, file_path, effects, gain, sound_id, max_voices=0, trace=None, retrigger="overlap", choke_group=None):
+        """Starts a StreamingVoice for file_path and queues it right away: the callback plays silence until the reader's
+           first block arrives, and reader errors come back through the event ring (stream_error_callback), so no worker waits here.
+        """
+        mixer = self.get_stream(device_name)
+        voice = StreamingVoice(sound_id, file_path, gain, max_voices, trace, retrigger, choke_group)
+        voice.start_reader(mixer.samplerate, mixer.channels, effects)
+        if trace is not None: trace.mark("decoded"); trace.mark("effects"); trace.mark("converted"); trace.mark("queued") # All run in the reader
+        mixer.add_voice(voice)
+        return voice
+
+    def stats(self):
+        with self._lock:
+            return {"open_streams": [{"device_index": m.device_index, "samplerate": m.samplerate, "channels": m.channels, "failed": m.failed,
+                                      "dropped_events": m.events.dropped} for m in self._streams.values()],
+                    "active_voices": sum(1 for m in self._streams.values() for v in m.voices() if not v.stopped),
+                    "max_voices": self.max_voices, "steal_policy": self.steal_policy, "devices": self.devices.stats()}
+
+    def active_voices(self):
+        with self._lock: return [v for mixer in self._streams.values() for v in mixer.voices() if not v.stopped]
+
+    def is_playing(self, sound_id):
+        return any(v.sound_id == sound_id for v in self.active_voices())
+
+    def stop_sound(self, sound_id):
+        """Stops every voice of sound_id; returns how many were playing."""
+        voices = [v for v in self.active_voices() if v.sound_id == sound_id]
+        for voice in voices: voice.stop()
+        return len(voices)
+
+    def stop_all(self):
+        with self._lock:
+            for mixer in self._streams.values(): mixer.stop_all()
+
+    def close(self):
+        self._logger_stop.set()
+        with self._lock: self._close_locked()
+
+    def _close_locked(self):
+        for mixer in self._streams.values(): mixer.close(); mixer.log_events(self.stream_error_callback) # Flush what the callback queued last
+        self._streams.clear(); self._logger_thread = None
+
+# --- Playback Worker Pool ---
+VoiceSpec = namedtuple("VoiceSpec", ("sound_id", "name", "file_path", "volume", "effects", "max_voices", "retrigger", "choke_group", "device_name", "stream_threshold"))
+VoiceSpec.__doc__ = "Immutable description of what a trigger plays, built once per sound and shared with worker threads."
+
+def freeze_effects(effects):
+    """Read-only copy of a sound's effect chain, safe to share between threads without deep-copying per trigger."""
+    return tuple(MappingProxyType({**fx, "params": MappingProxyType(dict(fx.get("params", {})))}) for fx in effects or [])
+
+class PlaybackWorkerPool:
+    """A fixed set of worker threads that prepare triggered sounds (cache lookup, decode on a miss) and queue them on the mixer.
+       Stopping bumps a generation counter, so commands queued before the stop are skipped instead of played.
+    """
+    def __init__(self, handler, workers=2):
+        self._handler = handler # Called as handler(spec, trace, generation) on a worker thread
+        self._queue = queue.SimpleQueue(); self._lock = threading.Lock()
+        self.generation = 0; self.busy = 0; self.submitted = 0; self.skipped = 0
+        self._threads = [threading.Thread(target=self._worker_func, name=f"playback-{i}", daemon=True) for i in range(max(1, workers))]
+        for thread in self._threads: thread.start()
+
+    def submit(self, spec, trace=None):
+        with self._lock: self.submitted += 1
+        self._queue.put((self.generation, spec, trace))
+
+    def is_current(self, generation): return generation == self.generation
+
+    def cancel_pending(self):
+        """Drops queued commands and tells in-flight ones not to start playback."""
+        with self._lock: self.generation += 1
+
+    def _worker_func(self):
+        while True:
+            command = self._queue.get()
+            if command is None: return
+            generation, spec, trace = command
+            if not self.is_current(generation): self.skipped += 1; continue
+            with self._lock: self.busy += 1
+            try: self._handler(spec, trace, generation)
+            except Exception as e: print(f"[Playback] Unhandled error preparing {spec.sound_id}: {e}"); traceback.print_exc()
+            finally:
+                with self._lock: self.busy -= 1
+
+    def pending(self): return self._queue.qsize() + self.busy
+
+    def shutdown(self, timeout=1.0):
+        self.cancel_pending()
+        for _ in self._threads: self._queue.put(None)
+        deadline = time.time() + timeout
+        for thread in self._threads: thread.join(max(0.0, deadline - time.time()))
+        return sum(1 for thread in self._threads if thread.is_alive())
+
+    def stats(self):
+        return {"worker_threads": len(self._threads), "alive_threads": sum(1 for thread in self._threads if thread.is_alive()), "busy": self.busy,
+                "queued": self._queue.qsize(), "submitted": self.submitted, "skipped_after_stop": self.skipped}
+
+# --- Hotkey Matching ---
+class HotkeyMatcher:
+    """Hotkey table compiled for the listener thread, keyed by (modifier bitmask, key id) instead of canonical strings.
+       A key id is the key's virtual key code (its char, or the pynput Key member, when there is none). A combination's
+       canonical name is only worked out the first time it is pressed, so later presses are dict lookups with no string building.
+    """
+    _UNRESOLVED = object()
+
+    def __init__(self, key_to_string, modifier_bits, bindings):
+        self._key_to_string = key_to_string # Canonical name of a pynput key, only called on a cache miss
+        self._modifier_bits = modifier_bits # Canonical modifier name -> bit
+        self._bindings = bindings # (modifier mask, canonical key name) -> action, from the config
+        self._key_bits = {} # key id -> modifier bit, 0 for ordinary keys
+        self._resolved = {} # (modifier mask, key id) -> action or None
+
+    @staticmethod
+    def key_id(key):
+        vk = getattr(key, 'vk', None)
+        if vk is not None: return vk
+        char = getattr(key, 'char', None)
+        return char if char is not None else key # pynput Key members are hashable enum values
+
+    def modifier_bit(self, key):
+        key_id = self.key_id(key); bit = self._key_bits.get(key_id)
+        if bit is None: bit = self._modifier_bits.get(self._key_to_string(key), 0); self._key_bits[key_id] = bit
+        return bit
+
+    def match(self, mask, key):
+        """Returns (modifier bit, action) for a key press; action is None when the combination isn't bound."""
+        bit = self.modifier_bit(key)
+        if bit: return bit, None
+        lookup = (mask, self.key_id(key)); action = self._resolved.get(lookup, self._UNRESOLVED)
+        if action is self._UNRESOLVED:
+            # Resolved per modifier mask: with Shift held the same key code can produce a different char
+            name = self._key_to_string(key)
+            action = self._bindings.get((mask, name)) if name else None; self._resolved[lookup] = action
+        return 0, action
+
+# --- Config Writer ---
+class ConfigWriter:
+    """Writes config.json on a background thread, replacing the file atomically (temp file + os.replace) so a crash
+       mid-write never leaves it truncated. A save requested while another is still queued just replaces its snapshot.
+    """
+    def __init__(self, on_error=None):
+        self._on_error = on_error # Called with a message from the writer thread when a write fails
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="configwriter"); self._lock = threading.Lock()
+        self._pending = None # (path, snapshot) not yet picked up by the writer thread
+        self.requests = 0; self.writes = 0; self.superseded = 0; self.errors = 0
+        self.last_write_ms = 0.0; self.last_bytes = 0; self.last_written = None
+
+    def submit(self, path, snapshot):
+        """Queues a snapshot (plain dicts/lists no longer touched by the caller) for writing to path."""
+        with self._lock:
+            self.requests += 1
+            if self._pending is not None: self.superseded += 1; self._pending = (path, snapshot); return # The queued job writes this one instead
+            self._pending = (path, snapshot)
+        try: self._executor.submit(self._write_pending)
+        except RuntimeError: self._write_pending() # Writer already shut down (exit), write synchronously
+
+    def _write_pending(self):
+        with self._lock: job, self._pending = self._pending, None
+        if job is None: return
+        path, snapshot = job; tmp_path = None; start = time.perf_counter()
+        try:
+            data = json.dumps(snapshot, indent=4, ensure_ascii=False).encode('utf-8')
+            directory = os.path.dirname(path); os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".config_", suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f: f.write(data); f.flush(); os.fsync(f.fileno())
+            os.replace(tmp_path, path); tmp_path = None
+            with self._lock:
+                self.writes += 1; self.last_write_ms = (time.perf_counter() - start) * 1000.0; self.last_bytes = len(data); self.last_written = time.strftime("%H:%M:%S")
+            print(f"Config saved successfully to {path} ({len(data) / 1024:.1f} KB in {self.last_write_ms:.1f} ms)")
+        except Exception as e:
+            with self._lock: self.errors += 1
+            message = "Error: Permission denied saving config!" if isinstance(e, PermissionError) else f"Error: Could not save config! {e}"
+            print(f"ERROR saving config to {path}: {e}")
+            if self._on_error: self._on_error(message)
+        finally:
+            if tmp_path:
+                try: os.remove(tmp_path)
+                except OSError: pass
+
+    def close(self):
+        """Waits for queued writes to finish."""
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "writes": self.writes, "superseded": self.superseded, "errors": self.errors,
+                    "last_write_ms": round(self.last_write_ms, 2), "last_bytes": self.last_bytes, "last_written": self.last_written}
+
+# --- File Watcher ---
+class _Inotify:
+    """Minimal ctypes binding to Linux inotify, limited to the directory entry events the file watcher needs."""
+    IN_MOVED_FROM = 0x40; IN_MOVED_TO = 0x80; IN_CREATE = 0x100; IN_DELETE = 0x200; IN_DELETE_SELF = 0x400; IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000; IN_IGNORED = 0x8000; IN_ONLYDIR = 0x01000000
+    WATCH_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+    EVENT = struct.Struct("iIII") # wd, mask, cookie, name length; followed by the name
+
+    def __init__(self, libc, fd):
+        self._libc = libc; self.fd = fd
+
+    @classmethod
+    def create(cls):
+        """Returns an instance, or None where inotify isn't available (non-Linux, restricted sandboxes, watch limits)."""
+        if not sys.platform.startswith("linux"): return None
+        try:
+            import ctypes, ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError) as e: print(f"[FileWatcher] inotify unavailable: {e}"); return None
+        return cls(libc, fd) if fd >= 0 else None
+
+    def add(self, directory):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self.WATCH_MASK)
+        return wd if wd >= 0 else None
+
+    def remove(self, wd): self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self):
+        """Drains pending events as (wd, mask) pairs."""
+        events = []
+        while True:
+            try: data = os.read(self.fd, 65536)
+            except BlockingIOError: return events
+            offset = 0
+            while offset + self.EVENT.size <= len(data):
+                wd, mask, _, name_length = self.EVENT.unpack_from(data, offset)
+                events.append((wd, mask)); offset += self.EVENT.size + name_length
+
+    def close(self): os.close(self.fd)
+
+class DirectoryWatcher:
+    """Tells when watched files appear or disappear, tracking directories instead of stat-ing every file.
+       Directories are rescanned (one os.scandir each) only when they change: inotify reports the change on Linux,
+       elsewhere - and for directories inotify can't watch - each directory's mtime is polled, one stat per directory.
+    """
+    POLL_SECONDS = 2.0
+
+    def __init__(self, on_change):
+        self._on_change = on_change # Called on the watcher thread with [(path, exists)] for files whose state changed
+        self._lock = threading.Lock(); self._wanted = {} # directory -> {normcased name: path}, replaced by watch()
+        self._rereport = False # Set by watch(force=True): forget what was reported and report every file again
+        self._dirs = {} # directory -> {'files', 'present', 'mtime', 'wd'}, only touched by the watcher thread
+        self._wds = {} # inotify watch descriptor -> directory
+        self._inotify = _Inotify.create(); self._wake_r = self._wake_w = None
+        if self._inotify: self._wake_r, self._wake_w = os.pipe()
+        self._reconfigure = threading.Event(); self._stopped = threading.Event(); self._thread = None
+        self.rescans = 0; self.polls = 0; self.events = 0; self.overflows = 0; self.reported = 0
+
+    def watch(self, paths, force=False):
+        """Replaces the watched set; files in new directories are reported once with their current state.
+           force re-reports every file, for callers whose sounds lost their status (e.g. a restored config).
+        """
+        wanted = {}
+        for path in paths:
+            if path: wanted.setdefault(os.path.dirname(path), {})[os.path.normcase(os.path.basename(path))] = path
+        with self._lock:
+            if wanted == self._wanted and not force: return
+            self._wanted = wanted; self._rereport = self._rereport or force
+        self._reconfigure.set(); self._wake()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="file-watcher", daemon=True); self._thread.start()
+
+    def stop(self):
+        self._stopped.set(); self._reconfigure.set(); self._wake()
+        if self._thread: self._thread.join(timeout=1.0)
+        if self._inotify:
+            self._inotify.close()
+            for fd in (self._wake_r, self._wake_w): os.close(fd)
+            self._inotify = None
+
+    def _wake(self):
+        if self._wake_w is not None:
+            try: os.write(self._wake_w, b"\0")
+            except OSError: pass
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if self._reconfigure.is_set(): self._reconfigure.clear(); self._apply_wanted()
+            if self._inotify:
+                ready, _, _ = select.select([self._inotify.fd, self._wake_r], [], [], self.POLL_SECONDS)
+                if self._stopped.is_set(): return
+                if self._wake_r in ready: os.read(self._wake_r, 4096)
+                if self._inotify.fd in ready: self._handle_events(self._inotify.read())
+            else:
+                self._reconfigure.wait(self.POLL_SECONDS)
+                if self._stopped.is_set(): return
+            self._poll_unwatched()
+
+    def _apply_wanted(self):
+        with self._lock: wanted = self._wanted; rereport, self._rereport = self._rereport, False
+        for directory in [d for d in self._dirs if d not in wanted]: self._drop_watch(self._dirs.pop(directory))
+        if rereport:
+            for state in self._dirs.values(): state['present'] = {}
+        for directory, files in wanted.items():
+            state = self._dirs.get(directory)
+            if state is None:
+                state = self._dirs[directory] = {'files': files, 'present': {}, 'mtime': None, 'wd': None}
+                self._add_watch(directory, state); self._rescan(directory, state)
+            elif rereport or state['files'] != files:
+                state['files'] = files; state['present'] = {name: exists for name, exists in state['present'].items() if name in files}
+                self._rescan(directory, state)
+
+    def _add_watch(self, directory, state):
+        if not self._inotify: return
+        wd = self._inotify.add(directory) # Fails for missing directories, which are polled until they come back
+        if wd is not None: state['wd'] = wd; self._wds[wd] = directory
+
+    def _drop_watch(self, state):
+        wd = state['wd']
+        if wd is None: return
+        state['wd'] = None
+        if self._wds.pop(wd, None) is not None and self._inotify:
+            try: self._inotify.remove(wd)
+            except OSError: pass
+
+    def _handle_events(self, events):
+        changed = set()
+        for wd, mask in events:
+            self.events += 1
+            if mask & _Inotify.IN_Q_OVERFLOW: # Sent with wd -1 when the kernel queue overflowed: changes were lost, rescan everything
+                self.overflows += 1; print("[FileWatcher] inotify queue overflowed, rescanning all directories."); changed.update(self._dirs); continue
+            directory = self._wds.get(wd)
+            if directory is None: continue
+            changed.add(directory)
+            if mask & (_Inotify.IN_IGNORED | _Inotify.IN_DELETE_SELF | _Inotify.IN_MOVE_SELF): # The watch is gone, fall back to polling
+                state = self._dirs.get(directory)
+                if state: self._drop_watch(state)
+        for directory in changed:
+            state = self._dirs.get(directory)
+            if state: self._rescan(directory, state)
+
+    def _poll_unwatched(self):
+        for directory, state in self._dirs.items():
+            if state['wd'] is not None: continue
+            self.polls += 1
+            try: mtime = os.stat(directory).st_mtime_ns
+            except OSError: mtime = None
+            if mtime == state['mtime']: continue
+            if mtime is not None: self._add_watch(directory, state) # Directory (re)appeared
+            self._rescan(directory, state)
+
+    def _rescan(self, directory, state):
+        self.rescans += 1
+        try:
+            state['mtime'] = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as entries: names = {os.path.normcase(entry.name) for entry in entries}
+        except OSError: state['mtime'] = None; names = set()
+        changes = []; present = state['present']
+        for name, path in state['files'].items():
+            exists = name in names
+            if present.get(name) != exists: present[name] = exists; changes.append((path, exists))
+        if changes:
+            self.reported += len(changes)
+            try: self._on_change(changes)
+            except Exception as e: print(f"[FileWatcher] Change callback failed: {e}")
+
+    def native_directories(self):
+        """Directories currently covered by an inotify watch (empty when polling)."""
+        return {directory for directory, state in self._dirs.copy().items() if state['wd'] is not None}
+
+    def stats(self):
+        dirs = list(self._dirs.copy().values()) # Copy first, the watcher thread may be adding directories
+        return {"mode": "inotify" if self._inotify else "polling", "directories": len(dirs), "native_watches": sum(1 for state in dirs if state['wd'] is not None),
+                "files": sum(len(state['files']) for state in dirs), "rescans": self.rescans, "polls": self.polls, "events": self.events, "overflows": self.overflows, "reported_changes": self.reported}
+
+# --- Sound Registry ---
+class SoundRegistry:
+    """Dict indexes over the config's sound list: by id, relative path, hotkey and group.
+       add/remove keep them current; code that edits an indexed field in place takes indexed_fields() before the edit
+       and passes it to update() afterwards. reindex() is only needed when the list itself is replaced (see ensure).
+    """
+    INDEXED_FIELDS = ("id", "relative_path", "hotkey", "group_id")
+
+    def __init__(self, sounds=None):
+        self.sounds = None; self.attach(sounds if sounds is not None else [])
+
+    def attach(self, sounds):
+        self.sounds = sounds; self.reindex()
+
+    def ensure(self, sounds):
+        """Re-attaches if the list was replaced or grown behind the registry's back (config load/restore); O(1) otherwise."""
+        if sounds is not self.sounds or len(sounds) != self._count: self.attach(sounds)
+        return self
+
+    def reindex(self):
+        self.by_id = {}; self.by_path = {}; self.by_hotkey = {}; self.by_group = {}; self._count = 0
+        for sound in self.sounds: self._index(sound)
+
+    def _index(self, sound):
+        sound_id = sound.get("id"); self._count += 1
+        if sound_id: self.by_id[sound_id] = sound
+        if sound.get("relative_path"): self.by_path.setdefault(sound["relative_path"], []).append(sound) # Lists: duplicates are allowed in old configs
+        if sound.get("hotkey"): self.by_hotkey.setdefault(sound["hotkey"], []).append(sound) # Lists, so setup_hotkeys can report duplicates
+        self.by_group.setdefault(sound.get("group_id", "default"), {})[sound_id] = sound
+
+    def _unindex(self, sound, fields):
+        sound_id = fields["id"]; self._count -= 1
+        if sound_id and self.by_id.get(sound_id) is sound: del self.by_id[sound_id]
+        for index, key in ((self.by_path, fields["relative_path"]), (self.by_hotkey, fields["hotkey"])):
+            if not key or key not in index: continue
+            remaining = [other for other in index[key] if other is not sound]
+            if remaining: index[key] = remaining
+            else: del index[key]
+        members = self.by_group.get(fields["group_id"])
+        if members is not None and members.get(sound_id) is sound:
+            del members[sound_id]
+            if not members: del self.by_group[fields["group_id"]]
+
+    @classmethod
+    def indexed_fields(cls, sound):
+        """The values the indexes file a sound under; take them before editing the sound in place."""
+        fields = {field: sound.get(field) for field in cls.INDEXED_FIELDS}; fields["group_id"] = sound.get("group_id", "default")
+        return fields
+
+    def get(self, sound_id): return self.by_id.get(sound_id)
+
+    def add(self, sound):
+        self.sounds.append(sound); self._index(sound)
+
+    def update(self, sound, old_fields):
+        """Re-files a sound whose indexed fields were edited in place; old_fields is indexed_fields() from before the edit."""
+        self._unindex(sound, old_fields); self._index(sound)
+
+    def remove(self, sound_id):
+        """Removes a sound from the list and the indexes; returns it, or None if the id is unknown."""
+        sound = self.by_id.get(sound_id)
+        if sound is None: return None
+        position = next(i for i, other in enumerate(self.sounds) if other is sound) # By identity, equal dicts may exist
+        del self.sounds[position]; self._unindex(sound, self.indexed_fields(sound))
+        return sound
+
+# --- Sound Search ---
+class SoundSearchIndex:
+    """Token index over sound names and file names for the global search box, rebuilt lazily after config changes.
+       Results are ranked whole-token matches first, then token prefixes, substrings of the name and finally fuzzy
+       (close spelling) token matches, which are only tried when nothing else matched.
+    """
+    TOKEN_PATTERN = re.compile(r"[^\W_]+")
+    FUZZY_CUTOFF = 0.75 # difflib similarity ratio a misspelled token needs to count as a match
+
+    def __init__(self):
+        self._entries = [] # (sound_id, lowercase name)
+        self._postings = {} # token -> [entry index]
+        self._vocabulary = [] # Sorted tokens, for prefix ranges via bisect
+        self.dirty = True
+
+    def invalidate(self): self.dirty = True
+
+    def rebuild(self, sounds):
+        entries = []; postings = {}
+        for sound in sounds:
+            sound_id = sound.get("id")
+            if not sound_id: continue
+            name = sound.get("name", "").lower(); file_name = os.path.splitext(os.path.basename(sound.get("relative_path") or ""))[0].lower()
+            index = len(entries); entries.append((sound_id, name))
+            for token in set(self.TOKEN_PATTERN.findall(name)) | set(self.TOKEN_PATTERN.findall(file_name)): postings.setdefault(token, []).append(index)
+        self._entries = entries; self._postings = postings; self._vocabulary = sorted(postings); self.dirty = False
+
+    def _prefixed(self, prefix):
+        position = bisect.bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            yield self._vocabulary[position]; position += 1
+
+    def search(self, query, limit=None):
+        """Returns the sound ids matching the query (at most `limit`, if given), best match first."""
+        query = query.strip().lower(); query_tokens = self.TOKEN_PATTERN.findall(query)
+        if not query_tokens: return []
+        # Whole-token (0) or prefix (1) match for every query token; a sound ranks by its weakest token
+        scores = None
+        for query_token in query_tokens:
+            matched = {}
+            for token in self._prefixed(query_token):
+                tier = 0 if token == query_token else 1
+                for index in self._postings[token]:
+                    if matched.get(index, 2) > tier: matched[index] = tier
+            scores = matched if scores is None else {index: max(tier, scores[index]) for index, tier in matched.items() if index in scores}
+        for index, (sound_id, name) in enumerate(self._entries): # Substring of the name (e.g. 'oun' in 'sound'), as the old per-tab filter matched
+            if index not in scores and query in name: scores[index] = 2
+        if not scores: # Fuzzy: close spellings of each query token
+            for query_token in query_tokens:
+                matched = {index for token in difflib.get_close_matches(query_token, self._vocabulary, n=8, cutoff=self.FUZZY_CUTOFF) for index in self._postings[token]}
+                scores = {index: 3 for index in matched} if not scores else {index: 3 for index in matched if index in scores}
+                if not scores: break
+        ranked = sorted(scores, key=lambda index: (scores[index], self._entries[index][1]))[:limit]
+        return [self._entries[index][0] for index in ranked]
+
 # --- Custom Widgets ---
 class SoundButton(QPushButton):
     def __init__(self, sound_data, parent=None):
         super().__init__(sound_data.get("name", "Unnamed"), parent)
         self.sound_data = sound_data; self.sound_id = sound_data.get("id")
-        self.file_missing = not sound_data.get("file_exists", True)
+        self.file_missing = sound_data.get("file_exists") is False; self.file_unknown = sound_data.get("file_exists") is None # Not verified yet
         self.setMinimumHeight(60); self.update_appearance()
     def set_file_missing(self, is_missing):
-        if self.file_missing != is_missing: self.file_missing = is_missing; self.update_appearance()
+        if self.file_missing != is_missing or self.file_unknown: self.file_missing = is_missing; self.file_unknown = False; self.update_appearance()
+    def set_file_status(self, file_exists):
+        """True / False from a sound's 'file_exists', or None while it hasn't been checked."""
+        if file_exists is None:
+            if not self.file_unknown: self.file_unknown = True; self.file_missing = False; self.update_appearance()
+        else: self.set_file_missing(not file_exists)
     def update_appearance(self):
         base_style = "QPushButton { color: white; border: 1px solid #666; padding: 14px; font-size: 10pt; }"
         pressed_style = "QPushButton:pressed { background-color: #606060; }"
         hover_style = "QPushButton:hover { background-color: #5A5A5A; }"
         if self.file_missing: self.setStyleSheet(base_style + "QPushButton { background-color: #802020; border: 1px solid red; }" + pressed_style + hover_style)
+        elif self.file_unknown: self.setStyleSheet(base_style + "QPushButton { background-color: #505050; color: #AAA; border: 1px dashed #777; }" + pressed_style + hover_style)
         else: self.setStyleSheet(base_style + "QPushButton { background-color: #505050; }" + pressed_style + hover_style)
     def contextMenuEvent(self, event):
         main_window = self.window()
@@ -125,7 +1510,7 @@ class SoundButton(QPushButton):
 
 # --- Dialog Classes ---
 class EditSoundDialog(QDialog):
-    def __init__(self, sound_data, groups, parent=None):
+    def __init__(self, sound_data, groups, parent=None, choke_groups=()):
         super().__init__(parent); self.sound_data_original = sound_data; self.sound_data_edited = copy.deepcopy(sound_data); self.groups = groups
         self.setWindowTitle(f"Edit Properties: {sound_data.get('name', '')}"); self.setMinimumWidth(450)
         self.layout = QVBoxLayout(self); form_layout = QtWidgets.QFormLayout()
@@ -137,6 +1522,13 @@ class EditSoundDialog(QDialog):
         for i, group in enumerate(self.groups): self.group_combo.addItem(group['name'], userData=group['id']);
         if group['id'] == self.sound_data_edited.get('group_id', 'default'): current_group_index = i
         self.group_combo.setCurrentIndex(current_group_index); form_layout.addRow("Group:", self.group_combo)
+        self.max_voices_spinbox = QSpinBox(); self.max_voices_spinbox.setRange(0, 64); self.max_voices_spinbox.setValue(self.sound_data_edited.get('max_voices', 0)); self.max_voices_spinbox.setSpecialValueText("Global limit"); form_layout.addRow("Max Voices:", self.max_voices_spinbox)
+        self.retrigger_combo = QComboBox()
+        for mode, label in RETRIGGER_MODES: self.retrigger_combo.addItem(label, userData=mode)
+        self.retrigger_combo.setCurrentIndex(max(0, self.retrigger_combo.findData(self.sound_data_edited.get('retrigger_mode', 'overlap')))); form_layout.addRow("When Re-Triggered:", self.retrigger_combo)
+        self.choke_combo = QComboBox(); self.choke_combo.setEditable(True); self.choke_combo.addItem("") # Empty = no choke group
+        for name in choke_groups: self.choke_combo.addItem(name)
+        self.choke_combo.setCurrentText(self.sound_data_edited.get('choke_group') or ""); self.choke_combo.lineEdit().setPlaceholderText("None (type a name to create one)"); form_layout.addRow("Choke Group:", self.choke_combo)
         self.layout.addLayout(form_layout); self.layout.addWidget(QLabel("--- Effects ---")); self.effects_widgets = {}; effects_layout = QVBoxLayout()
         defined_effects = []
         if _AUDIO_LIBS_LOADED:
@@ -171,6 +1563,8 @@ class EditSoundDialog(QDialog):
         self.button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Save | QDialogButtonBox.StandardButton.Cancel); self.button_box.accepted.connect(self.accept); self.button_box.rejected.connect(self.reject); self.layout.addWidget(self.button_box)
     def accept(self):
         self.sound_data_edited['name'] = self.name_input.text(); self.sound_data_edited['volume'] = round(self.volume_slider.value() / 100.0, 3); self.sound_data_edited['group_id'] = self.group_combo.currentData()
+        self.sound_data_edited['max_voices'] = self.max_voices_spinbox.value(); self.sound_data_edited['retrigger_mode'] = self.retrigger_combo.currentData()
+        self.sound_data_edited['choke_group'] = self.choke_combo.currentText().strip() or None
         updated_effects = []
         for effect_data in self.sound_data_edited.get('effects', []):
             fx_type = effect_data.get('type')
@@ -187,6 +1581,9 @@ class EditSoundDialog(QDialog):
                 updated_effects.append(effect_data)
         self.sound_data_edited['effects'] = updated_effects
         self.changes_made = (self.sound_data_edited != self.sound_data_original)
+        old_fx_sig = effects_signature(self.sound_data_original.get('effects', []))
+        if old_fx_sig != effects_signature(updated_effects): # Stale effect render, drop it from the sample cache
+            SAMPLE_CACHE.discard_render(self.sound_data_original.get('absolute_path'), old_fx_sig)
         if self.changes_made:
             self.sound_data_original.clear()
             self.sound_data_original.update(self.sound_data_edited)
@@ -442,8 +1839,17 @@ class SettingsDialog(QDialog):
         self.layout = QVBoxLayout(self); form_layout = QtWidgets.QFormLayout()
 
         self.device_combo = QComboBox(); self.populate_devices(); form_layout.addRow("Audio Output Device:", self.device_combo)
-        self.scan_spinbox = QSpinBox(); self.scan_spinbox.setRange(0, 1440); self.scan_spinbox.setValue(self.settings_edited.get('scan_interval_minutes', 15)); self.scan_spinbox.setSuffix(" minutes (0=disabled)"); form_layout.addRow("File Scan Interval:", self.scan_spinbox)
+        self.scan_spinbox = QSpinBox(); self.scan_spinbox.setRange(0, 1440); self.scan_spinbox.setValue(self.settings_edited.get('scan_interval_minutes', 15)); self.scan_spinbox.setSuffix(" minutes (0=disabled)"); form_layout.addRow("Rescan Unwatched Folders Every:", self.scan_spinbox)
         self.columns_spinbox = QSpinBox(); self.columns_spinbox.setRange(1, 20); self.columns_spinbox.setValue(self.settings_edited.get('grid_columns', 5)); form_layout.addRow("Grid Columns:", self.columns_spinbox)
+        self.cache_spinbox = QSpinBox(); self.cache_spinbox.setRange(0, 8192); self.cache_spinbox.setValue(self.settings_edited.get('sample_cache_mb', 256)); self.cache_spinbox.setSuffix(" MB (0=disabled)"); form_layout.addRow("Sample Cache Size:", self.cache_spinbox)
+        self.max_voices_spinbox = QSpinBox(); self.max_voices_spinbox.setRange(0, 256); self.max_voices_spinbox.setValue(self.settings_edited.get('max_voices', 32)); self.max_voices_spinbox.setSpecialValueText("Unlimited"); form_layout.addRow("Max Simultaneous Voices:", self.max_voices_spinbox)
+        self.steal_combo = QComboBox()
+        for policy, label in VOICE_STEAL_POLICIES: self.steal_combo.addItem(label, userData=policy)
+        self.steal_combo.setCurrentIndex(max(0, self.steal_combo.findData(self.settings_edited.get('voice_steal_policy', 'oldest')))); form_layout.addRow("When Limit Is Reached:", self.steal_combo)
+        self.stream_spinbox = QSpinBox(); self.stream_spinbox.setRange(0, 3600); self.stream_spinbox.setValue(self.settings_edited.get('stream_threshold_seconds', 30)); self.stream_spinbox.setSuffix(" seconds (0=never)"); form_layout.addRow("Stream Files Longer Than:", self.stream_spinbox)
+        self.preload_spinbox = QSpinBox(); self.preload_spinbox.setRange(1, 16); self.preload_spinbox.setValue(self.settings_edited.get('preload_workers', 2)); form_layout.addRow("Warm-Up Threads:", self.preload_spinbox)
+        self.disk_cache_spinbox = QSpinBox(); self.disk_cache_spinbox.setRange(0, 65536); self.disk_cache_spinbox.setValue(self.settings_edited.get('disk_cache_mb', 1024)); self.disk_cache_spinbox.setSuffix(" MB (0=disabled)"); form_layout.addRow("Disk Cache Size:", self.disk_cache_spinbox)
+        self.tab_unload_spinbox = QSpinBox(); self.tab_unload_spinbox.setRange(0, 1440); self.tab_unload_spinbox.setValue(self.settings_edited.get('tab_unload_minutes', 10)); self.tab_unload_spinbox.setSuffix(" minutes (0=never)"); form_layout.addRow("Unload Unused Tabs After:", self.tab_unload_spinbox)
 
         self.stop_hotkey_layout = QHBoxLayout()
         current_stop_hk = self.settings_edited.get('stop_all_hotkey')
@@ -638,7 +2044,10 @@ class SettingsDialog(QDialog):
 
     def accept(self):
         self.stop_capture_listener() # Stop listener on accept
-        selected_device_name = self.device_combo.currentData(); self.settings_edited['output_device_name'] = selected_device_name or "Default"; self.settings_edited['scan_interval_minutes'] = self.scan_spinbox.value(); self.settings_edited['grid_columns'] = self.columns_spinbox.value()
+        selected_device_name = self.device_combo.currentData(); self.settings_edited['output_device_name'] = selected_device_name or "Default"; self.settings_edited['scan_interval_minutes'] = self.scan_spinbox.value(); self.settings_edited['grid_columns'] = self.columns_spinbox.value(); self.settings_edited['sample_cache_mb'] = self.cache_spinbox.value()
+        self.settings_edited['max_voices'] = self.max_voices_spinbox.value(); self.settings_edited['voice_steal_policy'] = self.steal_combo.currentData()
+        self.settings_edited['stream_threshold_seconds'] = self.stream_spinbox.value(); self.settings_edited['preload_workers'] = self.preload_spinbox.value()
+        self.settings_edited['disk_cache_mb'] = self.disk_cache_spinbox.value(); self.settings_edited['tab_unload_minutes'] = self.tab_unload_spinbox.value()
         self.changes_made = (self.settings_edited != self.settings_original);
         if self.changes_made:
             self.settings_original.clear()
@@ -702,15 +2111,55 @@ class ManageGroupsDialog(QDialog):
         self.changes_made = (self.groups_edited != self.groups_original or bool(deleted_ids))
         if self.changes_made and bool(deleted_ids) and self._main_window and hasattr(self._main_window, 'config'):
             print(f"Moving sounds from deleted groups {deleted_ids} to default...")
-            main_app_sounds = self._main_window.config.get('sounds', [])
-            for sound in main_app_sounds:
-                if sound.get('group_id') in deleted_ids:
+            registry = self._main_window.registry
+            for group_id in deleted_ids:
+                for sound in list(registry.by_group.get(group_id, {}).values()):
                     print(f" -> Moving sound '{sound.get('name')}'")
-                    sound['group_id'] = 'default'
+                    old_fields = registry.indexed_fields(sound); sound['group_id'] = 'default'; registry.update(sound, old_fields)
         super().accept()
     def get_updated_groups(self):
         return self.groups_edited if self.result() == QDialog.DialogCode.Accepted and hasattr(self, 'changes_made') and self.changes_made else None
 
+class DiagnosticsDialog(QDialog):
+    STAGE_LABELS = {"play_internal": "Key event -> dispatch", "decoded": "Worker wait + cache / decode", "effects": "Effects render",
+                    "converted": "Resample / remix", "queued": "Queue on mixer / stream", "first_block": "Queue -> first block", "total": "Total"}
+
+    def __init__(self, main_window):
+        super().__init__(main_window); self._main_window = main_window
+        self.setWindowTitle("Diagnostics"); self.setMinimumSize(620, 480); self.layout = QVBoxLayout(self)
+        self.report_view = QtWidgets.QPlainTextEdit(); self.report_view.setReadOnly(True); self.report_view.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.SystemFont.FixedFont))
+        self.layout.addWidget(self.report_view)
+        button_layout = QHBoxLayout(); refresh_button = QPushButton("Refresh"); reset_button = QPushButton("Reset Latency Stats"); dump_button = QPushButton("Save as JSON..."); close_button = QPushButton("Close")
+        button_layout.addWidget(refresh_button); button_layout.addWidget(reset_button); button_layout.addWidget(dump_button); button_layout.addStretch(); button_layout.addWidget(close_button); self.layout.addLayout(button_layout)
+        refresh_button.clicked.connect(self.refresh); reset_button.clicked.connect(self.reset_latency); dump_button.clicked.connect(self.dump_json); close_button.clicked.connect(self.accept)
+        self.refresh()
+
+    def refresh(self):
+        diagnostics = self._main_window.collect_diagnostics(); lines = ["=== Trigger Latency (ms) ==="]
+        latency = diagnostics.get("latency", {})
+        if latency:
+            lines.append(f"{'Stage':<28}{'Count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'Max':>9}")
+            for stage, st in latency.items():
+                lines.append(f"{self.STAGE_LABELS.get(stage, stage):<28}{st['count']:>7}{st['p50']:>9.2f}{st['p95']:>9.2f}{st['p99']:>9.2f}{st['max']:>9.2f}")
+            if "total" in latency: lines.append("Total histogram: " + ", ".join(f"{label}: {count}" for label, count in latency["total"]["histogram"].items()))
+        else: lines.append("No triggers recorded yet.")
+        for section, values in diagnostics.items():
+            if section == "latency": continue
+            lines.append(""); lines.append(f"=== {section.replace('_', ' ').title()} ===")
+            lines.extend(f"{key}: {value}" for key, value in values.items()) if isinstance(values, dict) else lines.append(str(values))
+        self.report_view.setPlainText("\n".join(lines))
+
+    def reset_latency(self):
+        LATENCY_STATS.reset(); self.refresh()
+
+    def dump_json(self):
+        filepath, _ = QFileDialog.getSaveFileName(self, "Save Diagnostics", f"soundboard_diagnostics_{time.strftime('%Y%m%d_%H%M%S')}.json", "JSON Files (*.json)")
+        if not filepath: return
+        try:
+            with open(filepath, 'w', encoding='utf-8') as f: json.dump(self._main_window.collect_diagnostics(), f, indent=4)
+            print(f"Diagnostics saved to {filepath}")
+        except Exception as e: print(f"Error saving diagnostics: {e}"); QMessageBox.warning(self, "Save Diagnostics", f"Could not save diagnostics to\n{filepath}\n\nError: {e}")
+
 
 # --- Main Application Window ---
 class SoundboardWindow(QMainWindow):
@@ -726,14 +2175,56 @@ class SoundboardWindow(QMainWindow):
         'cmd_l': 'cmd', 'cmd_r': 'cmd', 'win_l': 'cmd', 'win_r': 'cmd', 'win': 'cmd'
     }
     CANONICAL_MODIFIERS = frozenset(MODIFIER_MAP.values())
+    MODIFIER_BITS = {'alt': 1, 'ctrl': 2, 'shift': 4, 'cmd': 8} # Held modifiers are tracked as a bitmask by the listener
+    STOP_ALL_ACTION = "__stop_all__" # HotkeyMatcher action for the Stop All hotkey (sound actions are sound ids)
+
+    warmup_progress_signal = Signal(int, int, str) # (done, total, stop reason) from warm-up worker threads
+    playback_status_signal = Signal(str) # Status bar messages from playback worker threads
+    playback_file_missing_signal = Signal(str) # sound_id whose file vanished, seen by a playback worker
+    file_status_signal = Signal(int, object, bool) # (check generation, [(sound_id, path, exists)], finished) from the file-verify thread
+    file_watch_signal = Signal(object) # [(path, exists)] for files the directory watcher saw appear or disappear
+    config_write_error_signal = Signal(str) # Status bar message from the config writer thread
+    config_changed = Signal(str) # Emitted after an edit to the live config ("sounds", "groups", "settings" or "all"); the view syncs incrementally
+    import_probe_signal = Signal(int, str, object, object) # (batch, path, info, error) from import worker threads
+    hotkey_dispatched_signal = Signal(str) # sound_id already handed to the playback pool by the hotkey listener
+
+    CONFIG_SAVE_DEBOUNCE_MS = 500 # Saves requested within this window are written once
+    FILE_STATUS_BATCH = 64 # File checks are reported to the GUI thread in batches of this size (or every 50 ms)
+    SEARCH_DEBOUNCE_MS = 150 # Search runs once typing pauses, not on every keystroke
+    SEARCH_RESULT_LIMIT = 200
+    TAB_UNLOAD_CHECK_MS = 60 * 1000 # How often tabs are checked against the 'tab_unload_minutes' setting
+    IMPORT_WORKERS = 4 # Import probes are mostly disk reads and header parsing
+    PLAYBACK_WORKERS = 2 # Trigger preparation is mostly cache hits; decodes on a miss are the only slow part
 
     def __init__(self):
         super().__init__()
-        self.config = {}; self.active_playback_threads = []; self.sound_buttons = {}
+        self.config = {}; self.sound_buttons = {}
+        self._registry = SoundRegistry() # Indexes over config["sounds"], see the registry property
+        self.config_writer = ConfigWriter(on_error=self.config_write_error_signal.emit); self.config_write_error_signal.connect(self.update_status)
+        self._config_save_requests = 0; self.config_save_timer = QTimer(self); self.config_save_timer.setSingleShot(True); self.config_save_timer.setInterval(self.CONFIG_SAVE_DEBOUNCE_MS); self.config_save_timer.timeout.connect(self.write_config_now)
+        self._group_views = {} # group_id -> {'tab', 'grid', 'container', 'order', ...}, kept between view updates
+        self._syncing_view = False; self._current_tab_page = None
+        self._verify_generation = 0; self._verify_changes = 0; self.file_status_signal.connect(self._apply_file_statuses)
+        self.file_watcher = DirectoryWatcher(self.file_watch_signal.emit); self._watched_paths = {} # absolute path -> [sound_id]
+        self.file_watch_signal.connect(self._apply_watched_changes)
+        self.search_index = SoundSearchIndex(); self._search_matches = None # Sound ids matching the search box, None when it's empty
+        self.config_changed.connect(self._on_config_changed)
+        self.audio_engine = MixerEngine(); self.audio_engine.stream_error_callback = self._on_stream_error
+        self.playback_pool = PlaybackWorkerPool(self._prepare_and_play, self.PLAYBACK_WORKERS)
+        self._voice_specs = {} # sound_id -> VoiceSpec, rebuilt after any config change
+        self.playback_status_signal.connect(self.update_status); self.playback_file_missing_signal.connect(self._mark_file_missing)
+        self.hotkey_dispatched_signal.connect(self._on_hotkey_dispatched)
+        self._hotkey_dispatch = {} # sound_id -> VoiceSpec for hotkeyed sounds, read lock-free by the pynput listener thread
+        self._hotkey_dispatch_pending = False
+        self.import_prober = ImportProber(self.import_probe_signal.emit); self._import = None # The import in progress, see add_sound_dialog
+        self.import_probe_signal.connect(self._on_import_probed)
+        self.preloader = LibraryPreloader(progress_callback=self.warmup_progress_signal.emit)
+        self.warmup_progress_signal.connect(self._on_warmup_progress)
         self._pynput_listener = None
-        self._current_modifiers = set()
+        self._modifier_mask = 0; self._hotkey_matcher = None
         self._hotkey_map = {}
         self._stop_all_hotkey_str = None
+        self._hotkey_event_times = {} # sound_id -> perf_counter() of the key press, picked up by _play_sound_internal
         self._file_check_event = None; self._current_popup = None
         self._tk_root = None
         self.load_config()
@@ -741,7 +2232,9 @@ class SoundboardWindow(QMainWindow):
         self._setup_ui()
         self.apply_dark_theme()
         self.file_check_timer = QTimer(self); self.file_check_timer.timeout.connect(self.check_files)
+        self.tab_unload_timer = QTimer(self); self.tab_unload_timer.setInterval(self.TAB_UNLOAD_CHECK_MS); self.tab_unload_timer.timeout.connect(self.unload_idle_tabs); self.tab_unload_timer.start()
         self.populate_groups_and_sounds()
+        self.start_library_warmup()
         self.start_file_integrity_check()
         self.setup_hotkeys()
         self.update_status("Ready.")
@@ -754,10 +2247,20 @@ class SoundboardWindow(QMainWindow):
         exit_action = QAction("&Exit", self); exit_action.triggered.connect(self.close)
         file_menu.addAction(settings_action); file_menu.addSeparator(); file_menu.addAction(backup_action); file_menu.addAction(restore_action); file_menu.addSeparator(); file_menu.addAction(exit_action)
         edit_menu = self.menu_bar.addMenu("&Edit"); manage_groups_action = QAction("Manage &Groups", self); manage_groups_action.triggered.connect(self.open_manage_groups_dialog); edit_menu.addAction(manage_groups_action)
+        audio_menu = self.menu_bar.addMenu("&Audio")
+        warmup_action = QAction("&Warm Up Sound Cache", self); warmup_action.triggered.connect(self.start_library_warmup)
+        cancel_warmup_action = QAction("&Cancel Warm-Up", self); cancel_warmup_action.triggered.connect(self.cancel_library_warmup)
+        rescan_devices_action = QAction("&Rescan Audio Devices", self); rescan_devices_action.triggered.connect(self.rescan_audio_devices)
+        purge_disk_cache_action = QAction("&Purge Disk Cache", self); purge_disk_cache_action.triggered.connect(self.purge_disk_cache)
+        diagnostics_action = QAction("&Diagnostics...", self); diagnostics_action.triggered.connect(self.open_diagnostics_dialog)
+        audio_menu.addAction(warmup_action); audio_menu.addAction(cancel_warmup_action); audio_menu.addAction(purge_disk_cache_action); audio_menu.addSeparator(); audio_menu.addAction(rescan_devices_action); audio_menu.addSeparator(); audio_menu.addAction(diagnostics_action)
         self.central_widget = QWidget(); self.setCentralWidget(self.central_widget); self.main_layout = QVBoxLayout(self.central_widget); self.main_layout.setContentsMargins(5, 5, 5, 5); self.main_layout.setSpacing(5)
-        top_bar_layout = QHBoxLayout(); self.search_input = QLineEdit(); self.search_input.setPlaceholderText("Search sounds in current tab...")
-        self.search_input.textChanged.connect(self.filter_sounds); self.add_button = QPushButton("Add Sound(s)"); self.add_button.setFixedWidth(120); self.add_button.clicked.connect(self.add_sound_dialog)
+        top_bar_layout = QHBoxLayout(); self.search_input = QLineEdit(); self.search_input.setPlaceholderText("Search all sounds... (Enter plays the top result)")
+        self.search_timer = QTimer(self); self.search_timer.setSingleShot(True); self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS); self.search_timer.timeout.connect(self.run_search)
+        self.search_input.textChanged.connect(self.search_timer.start); self.search_input.returnPressed.connect(self.play_top_search_result); self.add_button = QPushButton("Add Sound(s)"); self.add_button.setFixedWidth(120); self.add_button.clicked.connect(self.add_sound_dialog)
         top_bar_layout.addWidget(self.search_input); top_bar_layout.addWidget(self.add_button); self.main_layout.addLayout(top_bar_layout)
+        self.search_results = QListWidget(); self.search_results.setMaximumHeight(160); self.search_results.hide(); self.search_results.itemActivated.connect(self._on_search_result_activated)
+        self.main_layout.addWidget(self.search_results)
         self.tab_widget = QTabWidget(); self.tab_widget.setMinimumHeight(200); self.tab_widget.currentChanged.connect(self.on_tab_changed); self.main_layout.addWidget(self.tab_widget, stretch=1)
         self.status_label = QLabel("Status: Initializing..."); self.statusBar().addPermanentWidget(self.status_label)
         self.stop_button = QPushButton("Stop All Sounds"); self.stop_button.setStyleSheet("background-color: #A03030; color: white;"); self.stop_button.clicked.connect(self.stop_all_sounds)
@@ -768,20 +2271,54 @@ class SoundboardWindow(QMainWindow):
         self.setStyleSheet(""" QWidget{background-color:#222;color:#DDD}QMainWindow::separator{background-color:#444;width:1px;height:1px}QMenuBar,QMenu{background-color:#333;color:#DDD}QMenuBar::item:selected,QMenu::item:selected{background-color:#555}QPushButton{background-color:#505050;color:#FFF;border:1px solid #666;padding:5px;min-height:20px}QPushButton:hover{background-color:#5A5A5A}QPushButton:pressed{background-color:#606060}QLineEdit,QTextEdit,QPlainTextEdit,QSpinBox,QDoubleSpinBox{background-color:#333;color:#DDD;border:1px solid #666}QTabWidget::pane{border-top:1px solid #444;background-color:#282828}QTabBar::tab{background:#444;color:#CCC;border:1px solid #555;border-bottom:none;padding:5px 10px;margin-right:2px}QTabBar::tab:selected{background:#555;color:#FFF;margin-bottom:-1px}QTabBar::tab:hover{background:#5A5A5A}QScrollArea{border:none}QScrollBar:vertical{border:none;background:#282828;width:10px;margin:0}QScrollBar::handle:vertical{background:#555;min-height:20px}QScrollBar::add-line:vertical,QScrollBar::sub-line:vertical{height:0px}QScrollBar:horizontal{border:none;background:#282828;height:10px;margin:0}QScrollBar::handle:horizontal{background:#555;min-width:20px}QScrollBar::add-line:horizontal,QScrollBar::sub-line:horizontal{width:0px}QSlider::groove:horizontal{border:1px solid #555;height:8px;background:#333}QSlider::handle:horizontal{background:#777;border:1px solid #555;width:18px;margin:-2px 0;border-radius:3px}QComboBox{border:1px solid #666;background-color:#333;padding: 2px;}QComboBox::drop-down{border:none;background-color:#505050;width: 15px;}QComboBox::down-arrow{image: url(noimg.png); width: 10px; height: 10px;} QComboBox QAbstractItemView{border:1px solid #666;background-color:#333;color:#DDD;selection-background-color:#555}QStatusBar{background-color:#333;color:#DDD}QMenu{border:1px solid #555}QDialog{background-color:#282828}QListWidget{border:1px solid #666;background-color:#333;} QListWidget::item{padding: 3px;} QListWidget::item:selected{background-color:#555;} """)
 
     # --- Slots and Methods ---
+    @Slot()
+    def run_search(self):
+        """Runs the search box query against the index: lists matches from every group and filters the current tab's buttons."""
+        query = self.search_input.text().strip()
+        if not query: self._search_matches = None; self.search_results.clear(); self.search_results.hide(); self.filter_sounds(); return
+        if self.search_index.dirty: self.search_index.rebuild(self.config.get("sounds", []))
+        start = time.perf_counter(); sound_ids = self.search_index.search(query)
+        self._search_matches = set(sound_ids) # Uncapped: the tab filter must keep every matching button visible
+        group_names = {g.get("id"): g.get("name", "Unnamed") for g in self.config.get("groups", [])}
+        self.search_results.setUpdatesEnabled(False); self.search_results.clear()
+        for sound_id in sound_ids[:self.SEARCH_RESULT_LIMIT]: # Only the list widget is capped
+            sound_data = self.find_sound_by_id(sound_id)
+            if not sound_data: continue
+            item = QListWidgetItem(f"{sound_data.get('name', 'Unnamed')}    [{group_names.get(sound_data.get('group_id', 'default'), 'Default')}]")
+            item.setData(Qt.ItemDataRole.UserRole, sound_id); self.search_results.addItem(item)
+        if not sound_ids: self.search_results.addItem(QListWidgetItem("No matching sounds."))
+        self.search_results.setUpdatesEnabled(True); self.search_results.show()
+        print(f"Search '{query}': {len(sound_ids)} result(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+        self.filter_sounds()
+
+    @Slot(QListWidgetItem)
+    def _on_search_result_activated(self, item):
+        sound_id = item.data(Qt.ItemDataRole.UserRole)
+        if sound_id: self._play_sound_internal(sound_id, source='search')
+
+    @Slot()
+    def play_top_search_result(self):
+        if self.search_timer.isActive(): self.search_timer.stop(); self.run_search() # Enter pressed before the debounce fired
+        if self.search_results.count() and self.search_results.item(0).data(Qt.ItemDataRole.UserRole): self._on_search_result_activated(self.search_results.item(0))
+
     @Slot()
     def filter_sounds(self):
-        search_term = self.search_input.text().lower(); current_tab_widget = self.tab_widget.currentWidget();
-        if not current_tab_widget: return
-        scroll_area = current_tab_widget.findChild(QScrollArea);
-        if not scroll_area or not scroll_area.widget(): return
-        grid_container = scroll_area.widget(); grid_layout = grid_container.layout()
-        if not isinstance(grid_layout, QGridLayout): return
-        for i in range(grid_layout.count()):
-            widget = grid_layout.itemAt(i).widget()
-            if isinstance(widget, SoundButton): widget.setVisible(not search_term or search_term in widget.sound_data.get('name', '').lower())
+        """Hides the current tab's buttons that don't match the last search."""
+        current_page = self.tab_widget.currentWidget()
+        for view in self._group_views.values():
+            if view['tab'] is not current_page: continue
+            for sound_id in view['order']:
+                button = self.sound_buttons.get(sound_id)
+                if button: button.setVisible(self._search_matches is None or sound_id in self._search_matches)
 
     @Slot(int)
     def on_tab_changed(self, index):
+        now = time.monotonic()
+        for view in self._group_views.values():
+            if view['tab'] is self._current_tab_page: view['last_used'] = now # Idle time of the tab being left starts now
+        self._current_tab_page = self.tab_widget.currentWidget()
+        if not self._syncing_view and any(view['tab'] is self._current_tab_page and not view['built'] for view in self._group_views.values()):
+            self.sync_sound_view() # First visit (or visit after unloading): build the tab's buttons now
         self.filter_sounds() # Re-apply filter when tab changes
 
     @Slot()
@@ -793,10 +2330,16 @@ class SoundboardWindow(QMainWindow):
             updated_settings = dialog.get_updated_settings()
             if updated_settings:
                 print("Applying updated settings...");
+                device_changed = updated_settings.get('output_device_name') != self.config.get('settings', {}).get('output_device_name')
+                if device_changed:
+                    self.audio_engine.close() # Output device changed, mixer reopens on the new device at next trigger
+                    self.audio_engine.devices.invalidate("output device setting changed")
                 self.config['settings'] = updated_settings # Update main config dict
                 self.save_config();
+                self._apply_audio_settings() # Resize sample cache / voice limits if changed
+                if device_changed: self.start_library_warmup() # Cached audio is in the old device's format
                 self.start_file_integrity_check(); # Restart timer if interval changed
-                self.populate_groups_and_sounds(); # Repopulate if columns changed
+                self.config_changed.emit("settings") # Re-lays out the grids if columns changed
                 self.setup_hotkeys() # Re-setup if stop_all hotkey changed
             else:
                 print("Settings dialog accepted, but no changes detected.")
@@ -814,7 +2357,7 @@ class SoundboardWindow(QMainWindow):
                 self.config['groups'] = updated_groups # Update main config dict
                 # Note: Moving sounds from deleted groups is handled within the Dialog's accept()
                 self.save_config();
-                self.populate_groups_and_sounds() # Repopulate tabs
+                self.config_changed.emit("groups") # Adds, removes, renames or reorders tabs
             else:
                 print("Manage Groups dialog accepted, but no changes detected.")
         else:
@@ -847,6 +2390,8 @@ class SoundboardWindow(QMainWindow):
 
                 self._stop_hotkey_listener() # Stop listener before changing config
                 self.stop_all_sounds() # Stop sounds
+                self.audio_engine.close() # Restored config may target a different output device
+                self.audio_engine.devices.invalidate("config restored")
                 time.sleep(0.1) # Brief pause
 
                 self.config = loaded_config; # Replace current config
@@ -863,10 +2408,12 @@ class SoundboardWindow(QMainWindow):
                 self.config.setdefault("sounds", []) # Ensure sounds list exists
 
                 self._resolve_sound_paths() # Resolve paths for the newly loaded config
+                self._apply_audio_settings()
                 self.save_config(); # Save the potentially modified restored config immediately
-                self.populate_groups_and_sounds(); # Refresh UI
+                self.config_changed.emit("all") # Refresh UI
                 self.setup_hotkeys(); # Setup hotkeys based on new config
                 self.start_file_integrity_check() # Restart file checker
+                self.start_library_warmup() # Warm the restored library
                 self.update_status(f"Config restored from {os.path.basename(filepath)}")
             except json.JSONDecodeError as e_json:
                 print(f"Error during restore (JSON Decode): {e_json}"); self.show_error_popup("Restore Error", f"Could not decode JSON config from\n{filepath}\n\nError: {e_json}")
@@ -912,17 +2459,30 @@ class SoundboardWindow(QMainWindow):
 
         self.config = loaded_config;
         self._resolve_sound_paths() # Resolve paths after loading
+        self._apply_audio_settings()
+
+    def _apply_audio_settings(self):
+        """Pushes audio-related settings from the config into the playback subsystems."""
+        settings = self.config.get("settings", {}); self._invalidate_voice_specs() # Specs carry the device and stream threshold
+        SAMPLE_CACHE.set_budget(settings.get("sample_cache_mb", DEFAULT_CONFIG["settings"]["sample_cache_mb"]) * 1024 * 1024)
+        app_dir = get_script_directory()
+        if app_dir: DISK_CACHE.configure(os.path.join(app_dir, AUDIO_CACHE_DIRNAME), settings.get("disk_cache_mb", DEFAULT_CONFIG["settings"]["disk_cache_mb"]) * 1024 * 1024)
+        self.audio_engine.set_polyphony(settings.get("max_voices", 0), settings.get("voice_steal_policy", "oldest"))
 
     def save_config(self):
         if not self.config: return
-        print("Saving configuration..."); config_path = self._get_config_path()
+        self._invalidate_voice_specs(); self.search_index.invalidate(); self._update_file_watch() # Every config edit is followed by a save
+        self._config_save_requests += 1; self.config_save_timer.start() # Debounced: a burst of edits is written once, see write_config_now
+
+    @Slot()
+    def write_config_now(self):
+        """Snapshots the config on the GUI thread and hands it to the background writer."""
+        self.config_save_timer.stop()
+        if not self.config: return
+        config_path = self._get_config_path()
         if not config_path: print("ERROR: Cannot save config, path unknown."); return
-        try:
-            config_to_save = self._prepare_config_for_saving()
-            os.makedirs(os.path.dirname(config_path), exist_ok=True)
-            with open(config_path, 'w', encoding='utf-8') as f: json.dump(config_to_save, f, indent=4, ensure_ascii=False)
-            print(f"Config saved successfully to {config_path}")
-        except PermissionError: print(f"ERROR: Permission denied saving config to {config_path}"); self.update_status(f"Error: Permission denied saving config!")
+        print("Saving configuration...")
+        try: self.config_writer.submit(config_path, self._prepare_config_for_saving())
         except Exception as e: print(f"Error saving config: {e}"); traceback.print_exc(); self.update_status(f"Error: Could not save config! {e}")
 
     def _get_config_path(self):
@@ -930,6 +2490,7 @@ class SoundboardWindow(QMainWindow):
         return os.path.join(app_dir, CONFIG_FILENAME) if app_dir else None
 
     def _resolve_sound_paths(self):
+        self._invalidate_voice_specs()
         config_path = self._get_config_path();
         if not config_path: return
         config_dir = os.path.dirname(config_path)
@@ -939,195 +2500,286 @@ class SoundboardWindow(QMainWindow):
         for sound in sounds:
             sound_id = sound.get("id", "unknown"); relative_path = sound.get("relative_path"); abs_path_resolved = None
             if relative_path:
-                try:
-                    # Normalize slashes from config to native OS slashes
-                    native_rel_path = os.path.normpath(relative_path)
-
-                    # Try path relative to config first
-                    path_try1 = os.path.join(config_dir, native_rel_path)
-                    # Try path as absolute if it is
-                    path_try2 = native_rel_path if os.path.isabs(native_rel_path) else None
-
-                    if os.path.exists(path_try1):
-                        abs_path_resolved = os.path.abspath(path_try1)
-                    elif path_try2 and os.path.exists(path_try2):
-                        abs_path_resolved = os.path.abspath(path_try2)
-                    else:
-                        # If neither exists, still store the absolute path relative to config for checking later
-                        abs_path_resolved = os.path.abspath(path_try1)
+                # String operations only, no disk access: joining an absolute path onto config_dir yields the absolute path itself
+                try: abs_path_resolved = os.path.abspath(os.path.join(config_dir, os.path.normpath(relative_path)))
                 except Exception as e: print(f"Err resolving path for sound {sound_id} ('{relative_path}'): {e}"); abs_path_resolved = os.path.abspath(os.path.join(config_dir, relative_path)) # Fallback
             else:
                 print(f" -> Sound '{sound.get('name')}' has no relative_path defined.")
 
+            if abs_path_resolved != sound.get("absolute_path") or "file_exists" not in sound:
+                # Unknown until check_files verifies it in the background (False right away if there's no path at all)
+                sound["file_exists"] = None if abs_path_resolved else False
             sound["absolute_path"] = abs_path_resolved;
-            # Update file_exists status based on resolved path
-            sound["file_exists"] = os.path.exists(abs_path_resolved) if abs_path_resolved else False
 
 
+    RUNTIME_SOUND_KEYS = frozenset(("absolute_path", "file_exists")) # Resolved at load, never saved
+
     def _prepare_config_for_saving(self):
-        # Create a deep copy to avoid modifying the live config object
+        """Copy of the config for writing, without runtime state. Copies one level per sound/group: nested values such as
+           effect lists are always replaced on edit, never mutated in place, so the writer thread can read them safely.
+        """
         if not self.config: return {}
-        config_copy = copy.deepcopy(self.config)
-        # Remove runtime state from sounds before saving
-        if "sounds" in config_copy:
-            for sound in config_copy["sounds"]:
-                sound.pop("absolute_path", None) # Don't save absolute path
-                sound.pop("file_exists", None)   # Don't save runtime file status
-
-                # Normalize relative path to forward slashes for cross-platform
-                if "relative_path" in sound and sound["relative_path"]:
-                    sound["relative_path"] = sound["relative_path"].replace('\\', '/')
+        config_copy = {key: value for key, value in self.config.items() if key not in ("settings", "groups", "sounds")}
+        config_copy["settings"] = dict(self.config.get("settings", {})); config_copy["groups"] = [dict(g) for g in self.config.get("groups", [])]
+        sounds = []
+        for sound in self.config.get("sounds", []):
+            sound = {key: value for key, value in sound.items() if key not in self.RUNTIME_SOUND_KEYS}
+            # Normalize relative path to forward slashes for cross-platform
+            if sound.get("relative_path"): sound["relative_path"] = sound["relative_path"].replace('\\', '/')
+            sounds.append(sound)
+        config_copy["sounds"] = sounds
         return config_copy
 
     # --- UI Population ---
     def populate_groups_and_sounds(self, *args): # Added *args to handle potential signals sending arguments
+        """Full rebuild of the tabs and the current tab's buttons. Edits go through config_changed and sync_sound_view instead."""
         print("Populating UI...")
         if not self.central_widget: print("ERROR: Central widget not ready in populate!"); return
-        try:
-            current_tab_index = self.tab_widget.currentIndex()
-            self.tab_widget.clear(); self.sound_buttons.clear() # Clear tabs and button references
+        current_tab_index = self.tab_widget.currentIndex()
+        for view in self._group_views.values(): view['tab'].deleteLater()
+        for button in self.sound_buttons.values(): button.deleteLater()
+        self.search_index.invalidate(); self._syncing_view = True
+        try: self.tab_widget.clear(); self.sound_buttons.clear(); self._group_views.clear() # Clear tabs and button references
+        finally: self._syncing_view = False
+        self.sync_sound_view()
+        # Restore previous tab index if valid (on_tab_changed builds that tab)
+        if 0 <= current_tab_index < self.tab_widget.count(): self.tab_widget.setCurrentIndex(current_tab_index)
+        self.update_status("UI Populated.")
+
+    @Slot(str)
+    def _on_config_changed(self, kind):
+        print(f"Config changed ({kind}), updating view...")
+        self.search_index.invalidate() # Names may have been edited in place
+        self.sync_sound_view()
+        if self._search_matches is not None: self.run_search() # Results may include renamed, moved or deleted sounds
+
+    def _create_group_view(self, group_id):
+        """An empty tab page; its scroll area and buttons are only built when the tab is first shown (_build_group_view)."""
+        tab_content_widget = QWidget(); tab_layout = QVBoxLayout(tab_content_widget); tab_layout.setContentsMargins(0,0,0,0)
+        return {'group_id': group_id, 'tab': tab_content_widget, 'scroll': None, 'grid': None, 'container': None, 'built': False,
+                'order': [], 'columns': 0, 'stretch_row': 0, 'last_used': time.monotonic()}
+
+    def _build_group_view(self, view):
+        group_id = view['group_id']
+        scroll_area = QScrollArea(); scroll_area.setWidgetResizable(True); scroll_area.setObjectName(f"scrollArea_{group_id}")
+        grid_container = QWidget(); grid_container.setObjectName(f"gridContainer_{group_id}"); grid_layout = QGridLayout(grid_container); grid_layout.setSpacing(5)
+        scroll_area.setWidget(grid_container); view['tab'].layout().addWidget(scroll_area)
+        view.update(scroll=scroll_area, grid=grid_layout, container=grid_container, built=True, order=[], columns=0, stretch_row=0)
+
+    def _unload_group_view(self, view):
+        for sound_id in view['order']:
+            button = self.sound_buttons.pop(sound_id, None)
+            if button: button.deleteLater()
+        view['scroll'].deleteLater() # Takes the grid container with it
+        view.update(scroll=None, grid=None, container=None, built=False, order=[], columns=0, stretch_row=0)
 
+    @Slot()
+    def unload_idle_tabs(self):
+        """Frees the buttons of tabs that haven't been shown for 'tab_unload_minutes'; they are rebuilt on the next visit."""
+        idle_minutes = self.config.get('settings', {}).get('tab_unload_minutes', 10)
+        if idle_minutes <= 0: return
+        cutoff = time.monotonic() - idle_minutes * 60; current_page = self.tab_widget.currentWidget(); unloaded = 0
+        for view in self._group_views.values():
+            if view['built'] and view['tab'] is not current_page and view['last_used'] < cutoff: self._unload_group_view(view); unloaded += 1
+        if unloaded: print(f"Unloaded {unloaded} idle tab(s), {len(self.sound_buttons)} button(s) remain.")
+
+    def sync_sound_view(self):
+        """Brings the tabs and sound buttons in line with the config, adding, removing, moving or restyling only what changed.
+           Existing widgets are reused, so scroll positions and the current tab survive an edit.
+        """
+        if not self.central_widget: return
+        self._syncing_view = True # Tab inserts/moves below emit currentChanged; on_tab_changed must not re-enter
+        try:
             # Ensure default group exists in config before populating
             if not any(g.get('id') == 'default' for g in self.config.get('groups', [])):
                 self.config.setdefault('groups', []).insert(0, {"id": "default", "name": "Default"})
-
-            group_widgets = {} # Store {'group_id': {'tab': QWidget, 'grid': QGridLayout, 'container': QWidget}}
-            tab_index_map = {} # Store {'group_id': tab_index}
-            idx = 0
-            for group in self.config.get("groups", []):
-                group_id = group.get("id"); group_name = group.get("name", "Unnamed")
-                if not group_id: continue # Skip groups without ID
-
-                tab_content_widget = QWidget(); tab_layout = QVBoxLayout(tab_content_widget); tab_layout.setContentsMargins(0,0,0,0)
-                scroll_area = QScrollArea(); scroll_area.setWidgetResizable(True); scroll_area.setObjectName(f"scrollArea_{group_id}")
-                grid_container = QWidget(); grid_container.setObjectName(f"gridContainer_{group_id}"); grid_layout = QGridLayout(grid_container); grid_layout.setSpacing(5)
-                scroll_area.setWidget(grid_container); tab_layout.addWidget(scroll_area)
-
-                self.tab_widget.addTab(tab_content_widget, group_name);
-                group_widgets[group_id] = {'tab': tab_content_widget, 'grid': grid_layout, 'container': grid_container}
-                tab_index_map[group_id] = idx; idx += 1
-
-            num_columns = max(1, self.config.get('settings', {}).get('grid_columns', 5))
-
-            # Prepare sounds per group
-            sounds_in_groups = {group_id: [] for group_id in group_widgets}
-            default_group_id_exists = "default" in group_widgets
-
-            for sound_data in self.config.get("sounds", []):
-                group_id = sound_data.get("group_id", "default");
-
+            groups = [g for g in self.config.get("groups", []) if g.get("id")] # Skip groups without ID
+            wanted_group_ids = {g["id"] for g in groups}
+
+            # 1. Tabs: drop deleted groups, then insert, move and rename the rest to match the config order
+            for group_id in [gid for gid in self._group_views if gid not in wanted_group_ids]:
+                view = self._group_views.pop(group_id); self.tab_widget.removeTab(self.tab_widget.indexOf(view['tab'])); view['tab'].deleteLater()
+            for position, group in enumerate(groups):
+                group_id = group["id"]; group_name = group.get("name", "Unnamed"); view = self._group_views.get(group_id)
+                if view is None:
+                    view = self._group_views[group_id] = self._create_group_view(group_id)
+                    self.tab_widget.insertTab(position, view['tab'], group_name); continue
+                index = self.tab_widget.indexOf(view['tab'])
+                if index != position: self.tab_widget.tabBar().moveTab(index, position)
+                if self.tab_widget.tabText(position) != group_name: self.tab_widget.setTabText(position, group_name)
+
+            # 2. Sounds per group (only for built tabs; the current one is built here)
+            current_page = self._current_tab_page = self.tab_widget.currentWidget()
+            for view in self._group_views.values():
+                if view['tab'] is current_page and not view['built']: self._build_group_view(view)
+            registry = self.registry; orphaned = [group_id for group_id in registry.by_group if group_id not in self._group_views]
+            for group_id in orphaned: # If target group doesn't exist, fallback to default
+                for sound_data in list(registry.by_group[group_id].values()):
+                    print(f"Warning: Sound '{sound_data.get('name')}' assigned to non-existent group '{group_id}', moving to Default.")
+                    old_fields = registry.indexed_fields(sound_data); sound_data['group_id'] = 'default' # Fix in live config for consistency
+                    registry.update(sound_data, old_fields)
+            sounds_in_groups = {group_id: list(registry.by_group.get(group_id, {}).values()) for group_id, view in self._group_views.items() if view['built']}
+            for sound_data in (sound for sounds in sounds_in_groups.values() for sound in sounds):
                 # Ensure sound path is resolved if missing (can happen if added then immediately populated)
                 if "absolute_path" not in sound_data and sound_data.get("relative_path"):
-                    self._resolve_sound_paths() # Re-resolve might be needed here, inefficient but safe
-
-                target_group_id = group_id if group_id in group_widgets else "default"
-
-                if target_group_id in sounds_in_groups:
-                    sounds_in_groups[target_group_id].append(sound_data)
-                elif default_group_id_exists: # If target group doesn't exist, fallback to default
-                    print(f"Warning: Sound '{sound_data.get('name')}' assigned to non-existent group '{group_id}', moving to Default.")
-                    sounds_in_groups["default"].append(sound_data)
-                    sound_data['group_id'] = 'default' # Fix in live config for consistency
-                else: # Should not happen if default group check above works
-                    print(f"ERROR: Cannot assign sound '{sound_data.get('name')}' - group '{group_id}' missing and no Default group found!")
-
-            # Populate grids
-            for group_id, group_info in group_widgets.items():
-                grid_layout = group_info['grid']; grid_container = group_info['container']; col = 0; row = 0
-
-                # Clear existing widgets in the grid layout safely
-                while grid_layout.count():
-                    layout_item = grid_layout.takeAt(0)
-                    if layout_item and layout_item.widget(): layout_item.widget().deleteLater()
+                    self._resolve_sound_paths(); break # Re-resolve might be needed here, inefficient but safe (resolves every sound)
 
+            # 3. Buttons: reuse existing ones (refreshing text and state), create the new ones
+            num_columns = max(1, self.config.get('settings', {}).get('grid_columns', 5))
+            wanted_orders = {}; created = 0
+            for group_id, sounds in sounds_in_groups.items(): # Tabs that aren't built yet are filled on first visit
+                order = []
                 # Sort sounds alphabetically by name within each group
-                sorted_sounds = sorted(sounds_in_groups.get(group_id, []), key=lambda s: s.get('name', '').lower())
-
-                for sound_data in sorted_sounds:
+                for sound_data in sorted(sounds, key=lambda s: s.get('name', '').lower()):
                     sound_id = sound_data.get("id");
                     if not sound_id: continue # Skip sounds without ID
-
-                    # Ensure file_exists status is up-to-date
-                    if "absolute_path" in sound_data and "file_exists" not in sound_data:
-                        sound_data["file_exists"] = os.path.exists(sound_data["absolute_path"]) if sound_data["absolute_path"] else False
-
-                    btn = SoundButton(sound_data);
-                    btn.set_file_missing(not sound_data.get("file_exists", False))
-                    # Connect button click to the slot designed for button presses
-                    btn.clicked.connect(partial(self.play_sound_from_button, sound_id))
-                    grid_layout.addWidget(btn, row, col);
-                    self.sound_buttons[sound_id] = btn # Store reference
-
-                    col += 1;
-                    if col >= num_columns: col = 0; row += 1
-
-                # Add stretch to push buttons to the top-left
-                grid_layout.setRowStretch(row + 1, 1); grid_layout.setColumnStretch(num_columns, 1)
-
-            # Restore previous tab index if valid
-            if 0 <= current_tab_index < self.tab_widget.count():
-                self.tab_widget.setCurrentIndex(current_tab_index)
-
-            self.filter_sounds() # Apply search filter to the newly populated tabs
-            self.update_status("UI Populated.")
+                    btn = self.sound_buttons.get(sound_id)
+                    if btn is None:
+                        btn = SoundButton(sound_data); created += 1
+                        # Connect button click to the slot designed for button presses
+                        btn.clicked.connect(partial(self.play_sound_from_button, sound_id))
+                        self.sound_buttons[sound_id] = btn # Store reference
+                    else:
+                        btn.sound_data = sound_data # The dict may have been replaced (e.g. config restore)
+                        name = sound_data.get("name", "Unnamed")
+                        if btn.text() != name: btn.setText(name)
+                    btn.set_file_status(sound_data.get("file_exists")) # None (not verified yet) keeps the neutral look
+                    order.append(sound_id)
+                wanted_orders[group_id] = order
+
+            # 4. Remove the buttons of deleted sounds (and of sounds moved to a tab that isn't built)
+            wanted_sound_ids = {sound_id for order in wanted_orders.values() for sound_id in order}
+            removed = [sound_id for sound_id in self.sound_buttons if sound_id not in wanted_sound_ids]
+            for sound_id in removed: self.sound_buttons.pop(sound_id).deleteLater()
+
+            # 5. Re-place buttons only in grids whose order or column count changed (take all first, so moved buttons leave their old grid)
+            changed = [group_id for group_id, order in wanted_orders.items() if order != self._group_views[group_id]['order'] or self._group_views[group_id]['columns'] != num_columns]
+            for group_id in changed:
+                grid_layout = self._group_views[group_id]['grid']
+                while grid_layout.count(): grid_layout.takeAt(0)
+            for group_id in changed: self._layout_group(self._group_views[group_id], wanted_orders[group_id], num_columns)
+
+            self.filter_sounds() # Apply search filter to new or moved buttons
+            print(f"View synced: {created} button(s) created, {len(removed)} removed, {len(changed)} grid(s) re-laid out.")
         except Exception as e: print(f"Error populating UI: {e}"); traceback.print_exc(); self.update_status(f"Error: Failed to populate UI! {e}")
+        finally: self._syncing_view = False
+
+    def _layout_group(self, view, order, num_columns):
+        grid_layout = view['grid']; grid_container = view['container']; col = 0; row = 0
+        for sound_id in order:
+            btn = self.sound_buttons[sound_id]
+            if btn.parentWidget() is not grid_container: btn.setParent(grid_container) # Moved here from another group
+            grid_layout.addWidget(btn, row, col); btn.show()
+            col += 1;
+            if col >= num_columns: col = 0; row += 1
+        # Add stretch to push buttons to the top-left (clearing the previous layout's stretch)
+        grid_layout.setRowStretch(view['stretch_row'], 0)
+        if view['columns'] and view['columns'] != num_columns: grid_layout.setColumnStretch(view['columns'], 0)
+        grid_layout.setRowStretch(row + 1, 1); grid_layout.setColumnStretch(num_columns, 1)
+        view['order'] = order; view['columns'] = num_columns; view['stretch_row'] = row + 1
 
     # --- Sound Management ---
     @Slot()
     def add_sound_dialog(self):
         dialog = QFileDialog(self); dialog.setWindowTitle("Select Sound Files"); dialog.setFileMode(QFileDialog.FileMode.ExistingFiles); dialog.setNameFilter("Audio Files (*.wav *.mp3 *.ogg *.flac *.aac *.m4a *.opus);;All Files (*)")
-        if dialog.exec():
-            selected_files = dialog.selectedFiles()
-            if selected_files:
-                added_count = 0; config_dir = get_script_directory()
-                if not config_dir: self.show_error_popup("Error", "Cannot determine application directory to calculate relative paths."); return
-
-                for file_path in selected_files:
-                    try:
-                        abs_path = os.path.abspath(file_path)
-                        try: relative_path = os.path.relpath(abs_path, config_dir)
-                        except ValueError: relative_path = abs_path # Use absolute if on different drive (Windows)
-
-                        # Normalize path for cross-platform compatibility
-                        relative_path = relative_path.replace('\\', '/')
-
-                        # Check for duplicates based on relative path
-                        if any(s.get('relative_path') == relative_path for s in self.config.get('sounds', [])): print(f"Skipping duplicate: {relative_path}"); continue
-
-                        sound_id = f"snd_{uuid.uuid4().hex[:12]}"; sound_name = os.path.splitext(os.path.basename(file_path))[0]
-                        # Basic sound data structure
-                        new_sound_data = {
-                            "id": sound_id,
-                            "name": sound_name,
-                            "relative_path": relative_path, # Store path relative to config
-                            "volume": 1.0,
-                            "group_id": "default", # Add to default group initially
-                            "hotkey": None,
-                            "effects": []
-                        }
-                        # Add default effect structures if pedalboard is loaded
-                        if _AUDIO_LIBS_LOADED and pedalboard:
-                            if _pb_reverb_ok: new_sound_data["effects"].append({"type": "Reverb", "enabled": False, "params": {"room_size": 0.5}})
-                            if _pb_delay_ok: new_sound_data["effects"].append({"type": "Delay", "enabled": False, "params": {"delay_seconds": 0.3, "feedback": 0.4}})
-
-                        self.config.setdefault("sounds", []).append(new_sound_data); added_count += 1
-                    except Exception as e: print(f"Error processing file {file_path}: {e}"); traceback.print_exc(); self.show_error_popup("Add Sound Error", f"Could not process file:\n{os.path.basename(file_path)}\n\nError: {e}")
-
-                if added_count > 0:
-                    self._resolve_sound_paths(); # Resolve paths for newly added sounds
-                    self.save_config();
-                    self.populate_groups_and_sounds(); # Refresh UI
-                    self.setup_hotkeys(); # Update hotkey map if needed (though unlikely here)
-                    self.update_status(f"Added {added_count} sound(s).")
-                else:
-                    self.update_status("No new sounds added (duplicates or errors).")
-            else: # No files selected
-                self.update_status("File selection cancelled.")
+        if not dialog.exec() or not dialog.selectedFiles(): self.update_status("File selection cancelled."); return
+        config_dir = get_script_directory()
+        if not config_dir: self.show_error_popup("Error", "Cannot determine application directory to calculate relative paths."); return
+        self.cancel_import()
+
+        candidates = {} # absolute path -> relative path, in selection order
+        for file_path in dialog.selectedFiles():
+            abs_path = os.path.abspath(file_path)
+            try: relative_path = os.path.relpath(abs_path, config_dir)
+            except ValueError: relative_path = abs_path # Use absolute if on different drive (Windows)
+            relative_path = relative_path.replace('\\', '/') # Normalize path for cross-platform compatibility
+            # Check for duplicates based on relative path
+            if relative_path in self.registry.by_path or abs_path in candidates: print(f"Skipping duplicate: {relative_path}"); continue
+            candidates[abs_path] = relative_path
+        if not candidates: self.update_status("No new sounds added (duplicates or errors)."); return
+        if not _AUDIO_LIBS_LOADED: self._commit_import(list(candidates.items()), []); return # Nothing to probe with
+
+        # Probe in the background; the sounds are only added once every file has been checked
+        progress = QProgressDialog(f"Checking {len(candidates)} sound file(s)...", "Cancel", 0, len(candidates), self)
+        progress.setWindowTitle("Importing Sounds"); progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(400); progress.setAutoClose(False); progress.setAutoReset(False)
+        progress.canceled.connect(self.cancel_import)
+        batch = self.import_prober.start(list(candidates), self.IMPORT_WORKERS)
+        self._import = {"batch": batch, "candidates": candidates, "probed": {}, "failed": [], "progress": progress}
+        print(f"[Import] Probing {len(candidates)} files with {self.IMPORT_WORKERS} workers...")
+        progress.setValue(0)
+
+    @Slot(int, str, object, object)
+    def _on_import_probed(self, batch, path, info, error):
+        state = self._import
+        if not state or batch != state["batch"]: return # Import was cancelled
+        if info is not None: state["probed"][path] = info
+        else: state["failed"].append((path, error)); print(f"[Import] Skipping unreadable file {path}: {error}")
+        done = len(state["probed"]) + len(state["failed"])
+        state["progress"].setValue(done) # May process events (modal dialog), so `done` is taken first
+        if self._import is not state or done < len(state["candidates"]): return # Cancelled (or finished) during setValue
+        self._import = None; state["progress"].close()
+        accepted = [(path, relative_path) for path, relative_path in state["candidates"].items() if path in state["probed"]] # Selection order
+        self._commit_import(accepted, state["failed"], state["probed"])
+
+    @Slot()
+    def cancel_import(self):
+        state = self._import
+        if not state: return
+        self._import = None; self.import_prober.cancel(); state["progress"].close()
+        done = len(state["probed"]) + len(state["failed"])
+        print(f"[Import] Cancelled after {done}/{len(state['candidates'])} files."); self.update_status("Import cancelled, no sounds added.")
+
+    def _commit_import(self, accepted, failed, probed=None):
+        """Adds the imported files as sounds in one batch: one config change, one save, one hotkey rebuild.
+           probed: absolute path -> probe_audio_file info, None when the files couldn't be probed.
+        """
+        for abs_path, relative_path in accepted:
+            sound_id = f"snd_{uuid.uuid4().hex[:12]}"; sound_name = os.path.splitext(os.path.basename(abs_path))[0]
+            # Basic sound data structure
+            new_sound_data = {
+                "id": sound_id,
+                "name": sound_name,
+                "relative_path": relative_path, # Store path relative to config
+                "volume": 1.0,
+                "group_id": "default", # Add to default group initially
+                "hotkey": None,
+                "max_voices": 0, # 0 = only the global voice limit applies
+                "retrigger_mode": "overlap", "choke_group": None,
+                "effects": []
+            }
+            # Add default effect structures if pedalboard is loaded
+            if _AUDIO_LIBS_LOADED and pedalboard:
+                if _pb_reverb_ok: new_sound_data["effects"].append({"type": "Reverb", "enabled": False, "params": {"room_size": 0.5}})
+                if _pb_delay_ok: new_sound_data["effects"].append({"type": "Delay", "enabled": False, "params": {"delay_seconds": 0.3, "feedback": 0.4}})
+            if probed is not None: new_sound_data["absolute_path"] = abs_path; new_sound_data["file_exists"] = True # Just checked, _resolve_sound_paths keeps it
+            self.registry.add(new_sound_data)
+
+        if accepted and probed:
+            formats = {}
+            for abs_path, _ in accepted:
+                info = probed[abs_path]; audio_format = f"{info['sample_rate']} Hz/{info['channels']} ch ({info['decoder']})"; formats[audio_format] = formats.get(audio_format, 0) + 1
+            total_seconds = sum(probed[abs_path]["duration"] for abs_path, _ in accepted)
+            print(f"[Import] Adding {len(accepted)} sounds, {total_seconds / 60:.1f} min of audio: " + ", ".join(f"{count}x {audio_format}" for audio_format, count in sorted(formats.items())))
+        if accepted:
+            self._resolve_sound_paths(); self.save_config() # The save also puts the new files under the directory watcher
+            self.config_changed.emit("sounds") # Adds the new buttons
+            self.setup_hotkeys(); # Update hotkey map if needed (though unlikely here)
+        status_text = f"Added {len(accepted)} sound(s)." if accepted else "No new sounds added (duplicates or errors)."
+        if failed:
+            status_text += f" Skipped {len(failed)} unreadable file(s)."
+            details = "\n".join(f"{os.path.basename(path)}: {error}" for path, error in failed[:10])
+            if len(failed) > 10: details += f"\n...and {len(failed) - 10} more"
+            self.show_error_popup("Add Sound Error", f"Could not import {len(failed)} file(s):\n\n{details}")
+        self.update_status(status_text)
+
+    @property
+    def registry(self):
+        """The SoundRegistry over config["sounds"], re-attached if the list was replaced."""
+        return self._registry.ensure(self.config.setdefault("sounds", []))
 
     def find_sound_by_id(self, sound_id):
-        for sound in self.config.get("sounds", []):
-            if sound.get("id") == sound_id: return sound
-        return None
+        return self.registry.get(sound_id)
 
     @Slot(str)
     def delete_sound(self, sound_id):
@@ -1139,7 +2791,7 @@ class SoundboardWindow(QMainWindow):
             print(f"Deleting sound: {name} ({sound_id})");
             original_hotkey_str = sound_data.get('hotkey')
             # Remove the sound from the list
-            self.config['sounds'] = [s for s in self.config.get('sounds', []) if s.get('id') != sound_id]
+            self.registry.remove(sound_id)
 
             # If it had a hotkey, potentially update the hotkey map
             if original_hotkey_str:
@@ -1153,7 +2805,7 @@ class SoundboardWindow(QMainWindow):
                      self.setup_hotkeys() # Re-setup to be safe
 
             self.save_config();
-            self.populate_groups_and_sounds(); # Refresh UI
+            self.config_changed.emit("sounds") # Removes the button
             self.update_status(f"Deleted sound: {name}")
         else: print("Deletion cancelled.")
 
@@ -1179,7 +2831,7 @@ class SoundboardWindow(QMainWindow):
                 selected_file = selected_files[0]; print(f"New file selected: {selected_file}"); config_dir = get_script_directory()
                 if not config_dir: self.show_error_popup("Error", "Cannot determine application directory to calculate relative path."); return
 
-                was_missing = not sound_data.get("file_exists", True)
+                was_missing = sound_data.get("file_exists") is False # Unverified (None) sounds don't trigger the folder scan
 
                 abs_path = os.path.abspath(selected_file)
                 try: relative_path = os.path.relpath(abs_path, config_dir)
@@ -1190,10 +2842,12 @@ class SoundboardWindow(QMainWindow):
                 new_sound_name = os.path.splitext(os.path.basename(abs_path))[0]
 
                 # Update the sound data in the main config list
+                old_fields = self.registry.indexed_fields(sound_data)
                 sound_data["name"] = new_sound_name
                 sound_data["relative_path"] = relative_path;
                 sound_data["absolute_path"] = abs_path; # Update runtime path
                 sound_data["file_exists"] = True # Assume it exists since we just selected it
+                self.registry.update(sound_data, old_fields)
 
                 # Update the corresponding button's appearance
                 button_widget = self.sound_buttons.get(sound_id)
@@ -1210,7 +2864,7 @@ class SoundboardWindow(QMainWindow):
                         if other_sound.get('id') == sound_id:
                             continue # Skip the one we just relinked
 
-                        if not other_sound.get('file_exists', True): # It's missing
+                        if other_sound.get('file_exists') is False: # It's missing
                             old_other_path = other_sound.get('absolute_path') or other_sound.get('relative_path')
                             if old_other_path:
                                 # Extract just the filename
@@ -1223,7 +2877,8 @@ class SoundboardWindow(QMainWindow):
                                     # Normalize path
                                     other_rel_path = other_rel_path.replace('\\', '/')
 
-                                    other_sound["relative_path"] = other_rel_path
+                                    old_fields = self.registry.indexed_fields(other_sound); other_sound["relative_path"] = other_rel_path
+                                    self.registry.update(other_sound, old_fields)
                                     other_sound["absolute_path"] = potential_new_path
                                     other_sound["file_exists"] = True
 
@@ -1237,6 +2892,7 @@ class SoundboardWindow(QMainWindow):
                                     print(f"Auto-relinked: {other_sound.get('name')} to {potential_new_path}")
 
                 self.save_config(); # Save the updated relative path
+                self.config_changed.emit("sounds") # The new name re-sorts the tab and refreshes search results
                 if batch_relinked_count > 0:
                     msg = f"Changed '{name}' to '{new_sound_name}' and auto-relinked {batch_relinked_count} other missing files in the same folder."
                     self.update_status(msg)
@@ -1267,6 +2923,8 @@ class SoundboardWindow(QMainWindow):
     # Internal playback logic
     def _play_sound_internal(self, sound_id, source='unknown'):
         """Internal logic to play sound, called by button or hotkey slots."""
+        trace = TriggerTrace(sound_id, source, self._hotkey_event_times.pop(sound_id, None) if source == 'hotkey' else None)
+        trace.mark("play_internal")
         print(f"-> _play_sound_internal: ID={sound_id}, Triggered by={source}")
         if not _AUDIO_LIBS_LOADED:
             print(f"  - Playback aborted: Audio libs not loaded.")
@@ -1313,175 +2971,181 @@ class SoundboardWindow(QMainWindow):
         print(f"  - File exists. Preparing playback for: {sound_data['name']}")
         self.update_status(f"Playing: {sound_data['name']}")
 
-        stop_event = threading.Event();
-        # Pass a copy of sound_data to the thread to avoid race conditions if edited
-        thread_data = copy.deepcopy(sound_data)
-        thread_info = {'thread': None, 'stop_event': stop_event, 'sound_id': sound_id}
-        self.active_playback_threads.append(thread_info) # Add BEFORE starting thread
-
-        try:
-            print(f"  - Creating playback thread...")
-            playback_thread = threading.Thread(target=self._play_sound_thread_func, args=(thread_data, stop_event, thread_info), daemon=True)
-            thread_info['thread'] = playback_thread # Store thread object in the dict
-            print(f"  - Starting playback thread...")
-            playback_thread.start()
-            print(f"  - Playback thread started.")
-        except Exception as e:
-            print(f"  - ERROR starting playback thread: {e}");
-            # If thread failed to start, remove its info from the active list
-            try: self.active_playback_threads.remove(thread_info)
-            except ValueError: pass # Might have already been removed somehow
-            self.update_status(f"Error starting playback: {e}")
-
+        # Workers get an immutable spec, so edits made while a sound is being prepared can't race with it
+        self.playback_pool.submit(self._voice_spec(sound_data), trace)
         print(f"<- _play_sound_internal finished for ID={sound_id}")
 
-    def _play_sound_thread_func(self, sound_data, stop_event, thread_info_ref):
-        # This function runs in a separate thread
-        if not _AUDIO_LIBS_LOADED: return
+    def _voice_spec(self, sound_data):
+        """Returns the cached VoiceSpec for a sound, building it on first use after a config change."""
+        spec = self._voice_specs.get(sound_data.get("id"))
+        if spec is None:
+            settings = self.config.get("settings", {})
+            spec = VoiceSpec(sound_data.get("id", "unknown"), sound_data.get("name", "Unknown"), sound_data.get("absolute_path"), sound_data.get("volume", 1.0),
+                             freeze_effects(sound_data.get("effects", [])), sound_data.get("max_voices", 0),
+                             sound_data.get("retrigger_mode", "overlap"), sound_data.get("choke_group") or None,
+                             settings.get("output_device_name", "Default"), settings.get("stream_threshold_seconds", 30))
+            self._voice_specs[spec.sound_id] = spec
+        return spec
+
+    def _invalidate_voice_specs(self):
+        self._voice_specs.clear()
+        # Hotkeys fall back to the Qt path until the dispatch table is rebuilt from the updated config
+        self._hotkey_dispatch = {}
+        if not self._hotkey_dispatch_pending: self._hotkey_dispatch_pending = True; QTimer.singleShot(0, self._rebuild_hotkey_dispatch)
 
-        sound_id = sound_data.get("id", "unknown"); file_path = sound_data.get("absolute_path"); volume = sound_data.get("volume", 1.0); sound_name = sound_data.get("name", "Unknown"); stream = None
-        print(f"[Thread-{sound_id}] Starting playback for '{sound_name}' ({file_path})")
+    @Slot()
+    def _rebuild_hotkey_dispatch(self):
+        """Builds the sound_id -> VoiceSpec table used by the listener thread. Swapped in as a whole, never mutated in place."""
+        self._hotkey_dispatch_pending = False; dispatch = {}
+        for sound_id in self._hotkey_map.values():
+            sound_data = self.find_sound_by_id(sound_id)
+            if sound_data and sound_data.get("absolute_path"): dispatch[sound_id] = self._voice_spec(sound_data)
+        self._hotkey_dispatch = dispatch
+
+    def _prepare_and_play(self, spec, trace, generation):
+        # Runs on a playback worker thread
+        if not _AUDIO_LIBS_LOADED: return
+        sound_id = spec.sound_id; file_path = spec.file_path; sound_name = spec.name
+        print(f"[Worker-{sound_id}] Preparing playback for '{sound_name}' ({file_path})")
+        # Retriggers that won't start a new voice are settled here, before any decoding (the mixer enforces them again on admission)
+        if spec.retrigger in ("ignore", "toggle") and self.audio_engine.is_playing(sound_id):
+            if spec.retrigger == "toggle": self.audio_engine.stop_sound(sound_id); print(f"[Worker-{sound_id}] Toggled off.")
+            else: print(f"[Worker-{sound_id}] Already playing, retrigger ignored.")
+            return
 
         try:
-            # Load audio file
-            try: audio_segment = AudioSegment.from_file(file_path)
-            except FileNotFoundError: print(f"[Thread-{sound_id}] Error: File disappeared: {file_path}"); QTimer.singleShot(0, partial(self._mark_file_missing, sound_id)); return # Mark missing on main thread
-            except CouldntDecodeError as e: print(f"[Thread-{sound_id}] Error: Cannot decode '{sound_name}': {e}"); QTimer.singleShot(0, partial(self.update_status, f"Error: Cannot decode {sound_name}")); return
-            except Exception as e: print(f"[Thread-{sound_id}] Error loading file '{sound_name}': {e}"); traceback.print_exc(); QTimer.singleShot(0, partial(self.update_status, f"Error loading {sound_name}: {e}")); return
-
-            # Convert to numpy array (float32 for sounddevice)
-            samples = np.array(audio_segment.get_array_of_samples()).astype(np.float32);
-            # Normalize samples to [-1.0, 1.0]
-            samples /= (2**(audio_segment.sample_width * 8 - 1));
-            sample_rate = audio_segment.frame_rate
-
-            # Reshape for multi-channel if necessary
-            if audio_segment.channels > 1: samples = samples.reshape((-1, audio_segment.channels))
-            elif audio_segment.channels == 1: samples = samples.reshape((-1, 1)) # Ensure it's 2D even for mono
-            else: print(f"[Thread-{sound_id}] Warning: Audio segment reports 0 channels for '{sound_name}'"); samples = samples.reshape((-1, 1)) # Treat as mono if unknown
-
-            # Apply effects using Pedalboard if available and enabled
-            board = None
-            if pedalboard and hasattr(pedalboard, 'Pedalboard'): board = pedalboard.Pedalboard([])
-
-            if board is not None and "effects" in sound_data:
-                for fx_cfg in sound_data["effects"]:
-                    if fx_cfg.get("enabled", False):
-                        fx_type = fx_cfg.get("type"); params = fx_cfg.get("params", {})
-                        try:
-                            if hasattr(pedalboard, fx_type):
-                                effect_instance = getattr(pedalboard, fx_type)(**params);
-                                board.append(effect_instance);
-                                print(f"[Thread-{sound_id}] Added effect: {fx_type} with params {params}")
-                            else: print(f"[Thread-{sound_id}] Warn: Unknown or unavailable effect type '{fx_type}'")
-                        except Exception as e: print(f"[Thread-{sound_id}] Error creating effect '{fx_type}' with params {params}: {e}"); traceback.print_exc()
-
-            if board and len(board) > 0: # Only process if effects were actually added
-                print(f"[Thread-{sound_id}] Applying effects: {board}")
-                try: processed_samples = board(samples, sample_rate); print(f"[Thread-{sound_id}] Effects applied successfully.")
-                except Exception as e: print(f"[Thread-{sound_id}] Error applying effects: {e}"); traceback.print_exc(); processed_samples = samples # Fallback to original samples
-            else:
-                processed_samples = samples # No effects to apply
-
-            # Apply volume adjustment and clipping
-            processed_samples = np.clip(processed_samples * volume, -1.0, 1.0).astype(np.float32)
-
-            # Get output device index
-            output_dev_name = self.config.get("settings", {}).get("output_device_name", "Default"); output_dev_idx = None; actual_device_name = "Default"
-            if output_dev_name != "Default":
-                try:
-                    devices = sd.query_devices(); found = False
-                    for i, dev in enumerate(devices):
-                        if dev['name'] == output_dev_name and dev['max_output_channels'] > 0: output_dev_idx = i; actual_device_name = output_dev_name; found = True; break
-                    if not found: print(f"[Thread-{sound_id}] Warn: Output device '{output_dev_name}' not found/available. Using default.")
-                except Exception as e_dev: print(f"[Thread-{sound_id}] Error querying audio devices: {e_dev}. Using default."); traceback.print_exc()
-
-            num_channels = processed_samples.shape[1] if processed_samples.ndim > 1 else 1
-            if processed_samples.ndim == 1: processed_samples = processed_samples.reshape(-1, 1) # Ensure 2D for stream
-
-            print(f"[Thread-{sound_id}] Sending {num_channels}-ch audio @ {sample_rate}Hz to device: '{actual_device_name}' (Index: {output_dev_idx})")
-
-            # --- Playback using sounddevice stream ---
-            current_frame = 0; total_frames = len(processed_samples)
-            if total_frames == 0: print(f"[Thread-{sound_id}] Warning: Processed audio has zero frames for '{sound_name}'. Skipping playback."); return
-
-            # Define the callback function for the audio stream
-            def callback(outdata, frames, time_info, status):
-                nonlocal current_frame
-                if status: print(f"[Thread-{sound_id}] Stream status: {status}")
-                if stop_event.is_set(): print(f"[Thread-{sound_id}] Stop event detected in callback."); outdata.fill(0); raise sd.CallbackStop # Stop playback
-
-                chunk_end = current_frame + frames
-                remaining_frames = total_frames - current_frame
-
-                if remaining_frames <= frames:
-                    # Last chunk
-                    if remaining_frames > 0: outdata[:remaining_frames] = processed_samples[current_frame : current_frame + remaining_frames]
-                    outdata[remaining_frames:].fill(0) # Fill rest with silence
-                    current_frame += remaining_frames
-                    print(f"[Thread-{sound_id}] Reached end of audio data.");
-                    raise sd.CallbackStop # Signal stream completion
-                else:
-                    # Full chunk
-                    outdata[:] = processed_samples[current_frame:chunk_end];
-                    current_frame = chunk_end
-
-            # Create and start the output stream
-            stream = sd.OutputStream(samplerate=sample_rate, device=output_dev_idx, channels=num_channels, dtype=np.float32, callback=callback, finished_callback=lambda: print(f"[Thread-{sound_id}] Stream finished_callback executed."))
-            with stream:
-                print(f"[Thread-{sound_id}] Stream started. Playing {total_frames / sample_rate:.2f} seconds...")
-                # Wait for the stream to finish or stop_event to be set
-                while stream.active:
-                    if stop_event.wait(timeout=0.1): # Check stop event periodically
-                         print(f"[Thread-{sound_id}] Stop event detected while stream active.");
-                         # Stream will be stopped by the CallbackStop exception raised in the callback
-                         break
-                if not stream.active:
-                    print(f"[Thread-{sound_id}] Playback finished naturally (stream inactive).")
-
-        except sd.PortAudioError as pae: print(f"[Thread-{sound_id}] PortAudio Error playing '{sound_name}': {pae}"); traceback.print_exc(); QTimer.singleShot(0, partial(self.update_status, f"Audio Error: {pae}"))
-        except Exception as e: print(f"[Thread-{sound_id}] Generic error during playback of '{sound_name}': {e}"); traceback.print_exc(); QTimer.singleShot(0, partial(self.update_status, f"Playback Error: {e}"))
-        finally:
-            # Ensure the thread info is removed from the main list ON THE MAIN THREAD
-            QTimer.singleShot(0, partial(self._remove_active_thread, thread_info_ref))
-            print(f"[Thread-{sound_id}] Playback thread finished.")
+            # Long files are streamed block-wise instead of being decoded into RAM
+            duration = SAMPLE_CACHE.stream_duration(file_path) if spec.stream_threshold > 0 else None
+            if duration is not None and duration > spec.stream_threshold:
+                if not self.playback_pool.is_current(generation): print(f"[Worker-{sound_id}] Stop requested before playback started."); return
+                self.audio_engine.play_stream(spec.device_name, file_path, spec.effects, spec.volume, sound_id, spec.max_voices, trace, spec.retrigger, spec.choke_group)
+                SAMPLE_CACHE.record_decoder(file_path, "soundfile (streamed)")
+                print(f"[Worker-{sound_id}] Streaming {duration:.1f}s file on device: '{spec.device_name}'")
+                return
+
+            # Load audio file with its effects, converted to the device's native format (done once, then served from the sample cache)
+            out_format = self.audio_engine.output_format(spec.device_name)
+            try: decoded = SAMPLE_CACHE.get_or_render(file_path, spec.effects, trace, out_format)
+            except FileNotFoundError: print(f"[Worker-{sound_id}] Error: File disappeared: {file_path}"); self.playback_file_missing_signal.emit(sound_id); return # Mark missing on main thread
+            except CouldntDecodeError as e: print(f"[Worker-{sound_id}] Error: Cannot decode '{sound_name}': {e}"); self.playback_status_signal.emit(f"Error: Cannot decode {sound_name}"); return
+            except Exception as e: print(f"[Worker-{sound_id}] Error loading file '{sound_name}': {e}"); traceback.print_exc(); self.playback_status_signal.emit(f"Error loading {sound_name}: {e}"); return
+
+            sample_rate = decoded.sample_rate
+            cache_stats = SAMPLE_CACHE.stats(); print(f"[Worker-{sound_id}] Sample cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, {cache_stats['used_bytes'] / 1048576:.1f} MB used")
+
+            if len(decoded.samples) == 0: print(f"[Worker-{sound_id}] Warning: Processed audio has zero frames for '{sound_name}'. Skipping playback."); return
+            if not self.playback_pool.is_current(generation): print(f"[Worker-{sound_id}] Stop requested before playback started."); return
+
+            # --- Playback: hand the samples to the device's persistent mixer stream ---
+            # Volume and voice limits are applied by the mixer, the summed output is clipped there.
+            self.audio_engine.play(spec.device_name, decoded, spec.volume, sound_id, spec.max_voices, trace, spec.retrigger, spec.choke_group)
+            print(f"[Worker-{sound_id}] Queued {decoded.samples.shape[1]}-ch audio @ {sample_rate}Hz ({len(decoded.samples) / sample_rate:.2f}s, {decoded.decoder}) on device: '{spec.device_name}'")
+
+        except sd.PortAudioError as pae: print(f"[Worker-{sound_id}] PortAudio Error playing '{sound_name}': {pae}"); traceback.print_exc(); self.playback_status_signal.emit(f"Audio Error: {pae}")
+        except Exception as e: print(f"[Worker-{sound_id}] Generic error during playback of '{sound_name}': {e}"); traceback.print_exc(); self.playback_status_signal.emit(f"Playback Error: {e}")
 
+    @Slot(str)
+    def _on_hotkey_dispatched(self, sound_id):
+        """Status and file-state bookkeeping for a hotkey trigger, run on the main thread after playback was already queued."""
+        sound_data = self.find_sound_by_id(sound_id)
+        if not sound_data: return
+        abs_path = sound_data.get("absolute_path"); file_exists_now = os.path.exists(abs_path) if abs_path else False
+        if file_exists_now != sound_data.get("file_exists", False):
+            sound_data["file_exists"] = file_exists_now
+            button = self.sound_buttons.get(sound_id)
+            if button: button.set_file_missing(not file_exists_now)
+        if file_exists_now: self.update_status(f"Playing: {sound_data.get('name', 'Unknown')}")
+        else: self.update_status(f"Error: Cannot find file for {sound_data.get('name', 'Unknown')}")
 
     @Slot()
     def stop_all_sounds(self):
-        if not self.active_playback_threads: return
-        print(f"Stopping all sounds! ({len(self.active_playback_threads)} active)"); self.update_status("Stopping all sounds...")
-        # Iterate over a copy of the list as setting the event might trigger removal
-        for thread_info in list(self.active_playback_threads):
-            thread = thread_info.get('thread'); stop_event = thread_info.get('stop_event'); sound_id = thread_info.get('sound_id', 'unknown')
-            if stop_event: # Check if stop_event exists
-                 print(f"Signaling stop for sound ID: {sound_id}");
-                 stop_event.set()
-            # No need to join here, the thread will finish and remove itself
-
-    @Slot(dict)
-    def _remove_active_thread(self, thread_info_to_remove):
-        # This slot runs on the main thread, called by QTimer from the playback thread
-        initial_count = len(self.active_playback_threads)
-        try:
-            self.active_playback_threads.remove(thread_info_to_remove)
-            final_count = len(self.active_playback_threads)
-            sound_id = thread_info_to_remove.get('sound_id', 'unknown')
-            print(f"Playback thread reference removed for sound ID: {sound_id}. Remaining: {final_count}")
-        except ValueError:
-            sound_id = thread_info_to_remove.get('sound_id', 'unknown')
-            print(f"Attempted to remove thread reference for {sound_id}, but it was not found (likely already finished/removed).")
+        active_voices = self.audio_engine.active_voices(); preparing = self.playback_pool.pending()
+        if not preparing and not active_voices: return
+        print(f"Stopping all sounds! ({preparing} preparing, {len(active_voices)} playing)"); self.update_status("Stopping all sounds...")
+        self.playback_pool.cancel_pending() # Queued and in-flight triggers won't start playing
+        self.audio_engine.stop_all() # Voices already in the mixer are cut on the next audio block
+
+    def _on_stream_error(self, sound_id, error):
+        # Runs on the mixer's logger thread: a streamed file failed after its voice was queued
+        if isinstance(error, FileNotFoundError): self.playback_file_missing_signal.emit(sound_id)
+        else: self.playback_status_signal.emit(f"Playback Error: {error}")
 
     @Slot(str)
     def _mark_file_missing(self, sound_id):
         # This slot runs on the main thread, called by QTimer from playback thread
         sound_data = self.find_sound_by_id(sound_id)
-        if sound_data and sound_data.get('file_exists', True):
+        if sound_data and sound_data.get('file_exists') is not False:
             sound_data['file_exists'] = False;
             button = self.sound_buttons.get(sound_id)
             if button: button.set_file_missing(True) # Update button visual state
             self.update_status(f"Error: File missing for {sound_data.get('name', 'Unknown')}")
 
+    @Slot()
+    def rescan_audio_devices(self):
+        """Re-enumerates output devices, e.g. after plugging in a headset or virtual cable."""
+        if not _AUDIO_LIBS_LOADED: return
+        self.stop_all_sounds()
+        elapsed_ms = self.audio_engine.rescan_devices()
+        device_name = self.config.get("settings", {}).get("output_device_name", "Default")
+        self.audio_engine.devices.resolve(device_name) # Resolve now so the next trigger doesn't pay for it
+        self.update_status(f"Audio devices rescanned in {elapsed_ms:.0f} ms (output resolved in {self.audio_engine.devices.last_resolve_ms:.1f} ms).")
+
+    def collect_diagnostics(self):
+        """Snapshot of performance counters from the playback subsystems, as JSON-serializable dicts."""
+        decoders = {}
+        for snd in self.config.get("sounds", []):
+            decoder = SAMPLE_CACHE.decoder_for(snd["absolute_path"]) if snd.get("absolute_path") else None
+            if decoder: decoders[snd.get("name", snd.get("id"))] = decoder
+        return {"latency": LATENCY_STATS.summary(), "sample_cache": SAMPLE_CACHE.stats(), "disk_cache": DISK_CACHE.stats(), "mixer": self.audio_engine.stats(),
+                "playback": self.playback_pool.stats(), "decoders": decoders, "config_writer": dict(self.config_writer.stats(), save_requests=self._config_save_requests),
+                "file_watcher": self.file_watcher.stats(),
+                "view": {"tabs": len(self._group_views), "built_tabs": sum(view['built'] for view in self._group_views.values()), "buttons": len(self.sound_buttons)}}
+
+    @Slot()
+    def open_diagnostics_dialog(self):
+        DiagnosticsDialog(self).exec()
+
+    # --- Cache Warm-Up ---
+    @Slot()
+    def start_library_warmup(self):
+        """Decodes the library into the sample cache in the background: hotkeyed sounds first, then the current tab."""
+        if not _AUDIO_LIBS_LOADED: return
+        settings = self.config.get("settings", {})
+        current_page = self.tab_widget.currentWidget() # Tab index != group index: groups without an id get no tab
+        current_group_id = next((group_id for group_id, view in self._group_views.items() if view['tab'] is current_page), None)
+        def priority(sound):
+            if sound.get("hotkey"): return 0
+            return 1 if sound.get("group_id", "default") == current_group_id else 2
+        candidates = [snd for snd in self.config.get("sounds", []) if snd.get("absolute_path") and snd.get("file_exists") is not False] # Unverified files are tried too
+        jobs = [(snd.get("id"), snd["absolute_path"], freeze_effects(snd.get("effects", []))) for snd in sorted(candidates, key=priority)]
+        try: out_format = self.audio_engine.output_format(settings.get("output_device_name", "Default")) if jobs else None
+        except Exception as e: print(f"[Preload] Output device unavailable, skipping warm-up: {e}"); return # Nothing to convert to
+        self.preloader.start(jobs, settings.get("preload_workers", 2), settings.get("stream_threshold_seconds", 30), out_format)
+        if jobs: self.update_status(f"Warming up sounds: 0/{len(jobs)}")
+
+    @Slot()
+    def cancel_library_warmup(self):
+        if self.preloader.is_running(): self.preloader.cancel(); self.update_status("Sound warm-up cancelled.")
+
+    @Slot()
+    def purge_disk_cache(self):
+        """Deletes the persisted decoded audio; sounds are decoded again (and re-persisted) on next use."""
+        reply = QMessageBox.question(self, 'Purge Disk Cache', f"Delete all cached audio in '{AUDIO_CACHE_DIRNAME}'?\nSounds will be decoded again the next time they are used.", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes: return
+        removed, freed = DISK_CACHE.purge()
+        print(f"[DiskCache] Purged {removed} files ({freed / 1048576:.1f} MB).")
+        self.update_status(f"Disk cache purged: {removed} files, {freed / 1048576:.1f} MB freed.")
+
+    @Slot(int, int, str)
+    def _on_warmup_progress(self, done, total, stop_reason):
+        if stop_reason == "budget":
+            cache_stats = SAMPLE_CACHE.stats()
+            self.update_status(f"Warm-up stopped: sample cache budget reached after {done}/{total} sounds ({cache_stats['used_bytes'] / 1048576:.1f} MB).")
+        elif done >= total:
+            cache_stats = SAMPLE_CACHE.stats()
+            self.update_status(f"Warm-up complete: {cache_stats['entries']} cached sounds ({cache_stats['used_bytes'] / 1048576:.1f} MB).")
+        elif done % 5 == 0: self.update_status(f"Warming up sounds: {done}/{total}") # Throttled, the status bar need not repaint per sound
+
     # --- File Integrity ---
     @Slot()
     def start_file_integrity_check(self):
@@ -1491,47 +3155,83 @@ class SoundboardWindow(QMainWindow):
             print(f"Starting file integrity check timer ({interval_minutes} min)...");
             self.file_check_timer.setInterval(interval_minutes * 60 * 1000);
             self.file_check_timer.start();
-            # Run check once shortly after start
-            QTimer.singleShot(1000, self.check_files)
         else:
             print("File integrity check timer disabled (interval 0).")
+        # The directory watcher reports every file's initial state (freshly loaded sounds start unknown), then only changes;
+        # the timed rescan only re-checks folders without an inotify watch, whose polled mtimes can't always be trusted. Forced, because a restored
+        # config or changed settings can leave the statuses unknown while the watched paths stay the same
+        self._update_file_watch(force=True)
 
     @Slot()
     def check_files(self):
+        """Backstop for the directory watcher: verifies the files it can't get change notifications for (all of them when it
+           is polling mtimes) on a background thread; results stream into the buttons in batches as they come in.
+        """
         if not self.config: return
-        print("Checking file integrity...")
-        config_dir = get_script_directory()
-        if not config_dir: print("Warning: Cannot check files, config directory unknown."); return
-
-        all_ok = True; changes_detected = False
-        for sound in self.config.get("sounds", []):
-            sound_id = sound.get("id"); current_status = sound.get("file_exists", False); absolute_path = sound.get("absolute_path")
-
-            # If absolute path isn't stored, resolve it first (should generally be resolved already)
-            if not absolute_path and sound.get("relative_path"):
-                self._resolve_sound_paths() # This is inefficient if called often
-                sound = self.find_sound_by_id(sound_id) # Re-get sound data
-                if not sound: continue
-                absolute_path = sound.get("absolute_path")
-
-            new_status = os.path.exists(absolute_path) if absolute_path else False
-
-            if new_status != current_status:
-                sound["file_exists"] = new_status; changes_detected = True;
-                button = self.sound_buttons.get(sound_id)
-                # Use QTimer to update button from potentially different thread (though timer usually runs on main)
-                if button: QTimer.singleShot(0, partial(button.set_file_missing, not new_status))
-
-                if not new_status: print(f"File missing detected: {sound.get('name')} at {absolute_path}")
-                else: print(f"File found: {sound.get('name')} at {absolute_path}")
-
-            if not new_status: all_ok = False
-
-        if changes_detected:
-             status_text = "Status: OK" if all_ok else "Status: WARNING - Some files missing!";
-             self.update_status(status_text) # Update status bar only if changes found
-        else:
-             print("File integrity check: No changes detected.")
+        self._update_file_watch(); watched = self.file_watcher.native_directories()
+        self._verify_generation += 1; generation = self._verify_generation; self._verify_changes = 0
+        # Current tab and hotkeyed sounds first, they're the ones the user sees or can trigger right now
+        current_page = self.tab_widget.currentWidget()
+        current_group_id = next((group_id for group_id, view in self._group_views.items() if view['tab'] is current_page), None)
+        jobs = sorted(((snd.get("id"), snd.get("absolute_path"), 0 if snd.get("group_id", "default") == current_group_id else 1 if snd.get("hotkey") else 2)
+                       for snd in self.config.get("sounds", []) if snd.get("id") and os.path.dirname(snd.get("absolute_path") or "") not in watched), key=lambda job: job[2])
+        print(f"Checking file integrity ({len(jobs)} files outside inotify-watched folders)...")
+        threading.Thread(target=self._verify_files_worker, args=(generation, [(sound_id, path) for sound_id, path, _ in jobs]), name="file-verify", daemon=True).start()
+
+    def _verify_files_worker(self, generation, jobs):
+        # Runs on the file-verify thread; a newer check_files call makes it stop early
+        batch = []; last_emit = time.monotonic()
+        for sound_id, path in jobs:
+            if generation != self._verify_generation: return
+            try: exists = os.path.exists(path) if path else False
+            except Exception: exists = False
+            batch.append((sound_id, path, exists))
+            if len(batch) >= self.FILE_STATUS_BATCH or time.monotonic() - last_emit >= 0.05:
+                self.file_status_signal.emit(generation, batch, False); batch = []; last_emit = time.monotonic()
+        self.file_status_signal.emit(generation, batch, True)
+
+    @Slot(int, object, bool)
+    def _apply_file_statuses(self, generation, results, finished):
+        if generation != self._verify_generation: return # Superseded by a newer check
+        for sound_id, path, exists in results:
+            if self._set_file_status(sound_id, path, exists): self._verify_changes += 1
+        if finished:
+            if self._verify_changes:
+                all_ok = not any(snd.get("file_exists") is False for snd in self.config.get("sounds", []))
+                status_text = "Status: OK" if all_ok else "Status: WARNING - Some files missing!";
+                self.update_status(status_text) # Update status bar only if changes found
+            else:
+                print("File integrity check: No changes detected.")
+
+    def _set_file_status(self, sound_id, path, exists):
+        """Records a file check result; returns True when it is a change worth reporting."""
+        sound = self.find_sound_by_id(sound_id)
+        if not sound or sound.get("absolute_path") != path: return False # Deleted or relinked meanwhile
+        previous = sound.get("file_exists")
+        if previous == exists and previous is not None: return False
+        sound["file_exists"] = exists
+        button = self.sound_buttons.get(sound_id)
+        if button: button.set_file_status(exists)
+        if previous is None and exists: return False # First verification after load, nothing to report
+        if not exists: print(f"File missing detected: {sound.get('name')} at {path}")
+        else: print(f"File found: {sound.get('name')} at {path}")
+        return True
+
+    def _update_file_watch(self, force=False):
+        """Points the directory watcher at the current sound files; force has it report every file's state again."""
+        watched = {}
+        for snd in self.config.get("sounds", []):
+            if snd.get("id") and snd.get("absolute_path"): watched.setdefault(snd["absolute_path"], []).append(snd["id"])
+        self._watched_paths = watched; self.file_watcher.watch(watched, force)
+
+    @Slot(object)
+    def _apply_watched_changes(self, changes):
+        changed = 0
+        for path, exists in changes:
+            for sound_id in self._watched_paths.get(path, ()): changed += self._set_file_status(sound_id, path, exists)
+        if changed:
+            all_ok = not any(snd.get("file_exists") is False for snd in self.config.get("sounds", []))
+            self.update_status("Status: OK" if all_ok else "Status: WARNING - Some files missing!")
 
     # --- Pynput Hotkey Helper Functions ---
 
@@ -1617,34 +3317,31 @@ class SoundboardWindow(QMainWindow):
     def _on_press(self, key):
         # This runs in the pynput listener thread
         try:
-            key_str = self._key_to_string(key) # Get canonical string part
-            if not key_str: return # Ignore keys we can't represent
-
-            is_modifier = self.MODIFIER_MAP.get(key_str, key_str) in self.CANONICAL_MODIFIERS
-
-            if is_modifier:
-                mod_name = self.MODIFIER_MAP.get(key_str, key_str) # Ensure we add the canonical name
-                self._current_modifiers.add(mod_name)
-                # print(f"Global Mod Press: {mod_name}, Current: {self._current_modifiers}") # Debug
+            matcher = self._hotkey_matcher
+            if matcher is None: return
+            bit, action = matcher.match(self._modifier_mask, key)
+            if bit: self._modifier_mask |= bit; return
+            if action is None: return # Unbound combination, or a key we can't represent
+
+            if action == self.STOP_ALL_ACTION:
+                print("[Hotkey Listener] Stop All hotkey detected.")
+                # Both calls are thread-safe; a QTimer started from this thread would never fire (it has no Qt event loop)
+                self.playback_pool.cancel_pending(); self.audio_engine.stop_all()
+                self.playback_status_signal.emit("Stopping all sounds...")
+                return
+
+            key_time = time.perf_counter() # Latency trace starts at the key event
+            spec = self._hotkey_dispatch.get(action)
+            if spec is not None and _AUDIO_LIBS_LOADED:
+                # Straight to the playback pool, so a busy GUI thread can't delay the sound; the UI catches up via a signal
+                trace = TriggerTrace(spec.sound_id, 'hotkey', key_time); trace.mark("play_internal")
+                self.playback_pool.submit(spec, trace)
+                print(f"[Hotkey Listener] Sound hotkey dispatched for ID: {action}")
+                self.hotkey_dispatched_signal.emit(action)
             else:
-                # Non-modifier key pressed - check for match
-                current_combo_str = self._hotkey_to_string(self._current_modifiers, key)
-                # print(f"Global Combo Check: {current_combo_str}") # Debug
-
-                if not current_combo_str: return # Invalid combo (e.g., main key was modifier)
-
-                # Check against sound hotkeys
-                if current_combo_str in self._hotkey_map:
-                    sound_id = self._hotkey_map[current_combo_str]
-                    print(f"[Hotkey Listener] Sound hotkey '{current_combo_str}' detected for ID: {sound_id}")
-                    self.trigger_sound_from_hotkey(sound_id) # Schedules via invokeMethod
-
-                # Check against stop_all hotkey
-                if self._stop_all_hotkey_str and current_combo_str == self._stop_all_hotkey_str:
-                    print(f"[Hotkey Listener] Stop All hotkey '{current_combo_str}' detected.")
-                    # Use QTimer for stop all, as it's less critical than sound trigger timing
-                    # and avoids potential invokeMethod complexity if stop_all itself takes time.
-                    QTimer.singleShot(0, self.stop_all_sounds)
+                self._hotkey_event_times[action] = key_time
+                print(f"[Hotkey Listener] Sound hotkey detected for ID: {action}")
+                self.trigger_sound_from_hotkey(action) # Schedules via invokeMethod
 
         except Exception as e:
             print(f"ERROR in pynput _on_press: {e}"); traceback.print_exc()
@@ -1652,14 +3349,8 @@ class SoundboardWindow(QMainWindow):
     def _on_release(self, key):
         # This runs in the pynput listener thread
         try:
-            key_str = self._key_to_string(key) # Get canonical string part
-            if not key_str: return
-
-            mod_name = self.MODIFIER_MAP.get(key_str, key_str) # Get canonical name
-            # Use discard to safely remove the modifier if it exists
-            self._current_modifiers.discard(mod_name)
-            # print(f"Global Mod Release: {mod_name}, Current: {self._current_modifiers}") # Debug
-
+            matcher = self._hotkey_matcher
+            if matcher is not None: self._modifier_mask &= ~matcher.modifier_bit(key)
         except Exception as e:
             print(f"ERROR in pynput _on_release: {e}"); traceback.print_exc()
 
@@ -1671,11 +3362,11 @@ class SoundboardWindow(QMainWindow):
         self._hotkey_map = {}; self._stop_all_hotkey_str = None; has_valid_hotkeys = False
 
         # Build the map from config
-        config_sounds = self.config.get("sounds", [])
+        config_sounds = [sound for sounds in self.registry.by_hotkey.values() for sound in sounds] # Only sounds with a hotkey
         config_stop_all = self.config.get('settings', {}).get('stop_all_hotkey')
 
         # 1. Map sound hotkeys, checking for internal conflicts
-        temp_sound_map = {}
+        temp_sound_map = {}; parsed = {} # hotkey string -> (modifiers, main key), each string is parsed once
         sound_conflicts = set()
         for sound in config_sounds:
             hotkey_str = sound.get("hotkey"); sound_id = sound.get("id")
@@ -1690,14 +3381,14 @@ class SoundboardWindow(QMainWindow):
                      print(f"WARN: Duplicate sound hotkey '{hotkey_str}' defined for '{sound.get('name')}' (ID: {sound_id}). It conflicts with '{conflicting_name}' (ID: {conflicting_id}). Both will be disabled.")
                      sound_conflicts.add(hotkey_str) # Mark this hotkey as conflicted
                  else:
-                     temp_sound_map[hotkey_str] = sound_id
+                     temp_sound_map[hotkey_str] = sound_id; parsed[hotkey_str] = (mods, main_key)
 
         # 2. Process stop_all hotkey
         valid_stop_all_str = None
         if config_stop_all:
             mods, main_key = self._string_to_parts(config_stop_all)
             if main_key is None: print(f"WARN: Invalid Stop All hotkey format in config: '{config_stop_all}'. It will not be registered.")
-            else: valid_stop_all_str = config_stop_all # Format seems valid
+            else: valid_stop_all_str = config_stop_all; parsed[config_stop_all] = (mods, main_key) # Format seems valid
 
         # 3. Finalize maps, checking cross-conflicts and previously found duplicates
         self._hotkey_map = {}
@@ -1726,10 +3417,18 @@ class SoundboardWindow(QMainWindow):
                  print(f"Stop All Hotkey: '{self._stop_all_hotkey_str}' will be active.");
                  has_valid_hotkeys = True
 
+        # 5. Compile the final map for the listener: (modifier mask, key name) -> sound id / Stop All
+        bindings = {}
+        for hotkey_str, action in list(self._hotkey_map.items()) + ([(self._stop_all_hotkey_str, self.STOP_ALL_ACTION)] if self._stop_all_hotkey_str else []):
+            mods, main_key = parsed[hotkey_str]
+            bindings[(sum(self.MODIFIER_BITS[m] for m in mods), main_key)] = action
+        self._hotkey_matcher = HotkeyMatcher(self._key_to_string, self.MODIFIER_BITS, bindings)
+        self._rebuild_hotkey_dispatch()
+
         # Start listener only if there are any active hotkeys
         if has_valid_hotkeys:
             try:
-                print("Starting pynput listener thread..."); self._current_modifiers = set() # Reset modifier state
+                print("Starting pynput listener thread..."); self._modifier_mask = 0 # Reset modifier state
                 self._pynput_listener = pynput_kb.Listener(on_press=self._on_press, on_release=self._on_release)
                 self._pynput_listener.start(); print("pynput listener thread started.")
             except Exception as e: print(f"ERROR: Failed to start pynput listener: {e}"); traceback.print_exc(); self._pynput_listener = None; self.show_error_popup("Hotkey Listener Error", f"Could not start hotkey listener:\n{e}")
@@ -1742,7 +3441,7 @@ class SoundboardWindow(QMainWindow):
             try: self._pynput_listener.stop()
             except Exception as e: print(f"Error stopping pynput listener: {e}")
             # No need to join, stop() is usually sufficient
-            self._pynput_listener = None; self._current_modifiers = set(); print("pynput listener stopped.")
+            self._pynput_listener = None; self._modifier_mask = 0; print("pynput listener stopped.")
 
     # --- MODIFIED: Use QMetaObject.invokeMethod ---
     def trigger_sound_from_hotkey(self, sound_id):
@@ -1835,14 +3534,15 @@ class SoundboardWindow(QMainWindow):
     def open_edit_properties_dialog(self, sound_data):
         self.dismiss_current_popup();
         # Pass a copy for editing, original is updated by dialog on accept+changes
-        dialog = EditSoundDialog(sound_data, self.config.get('groups', []), self)
+        choke_groups = sorted({snd.get('choke_group') for snd in self.registry.sounds if snd.get('choke_group')})
+        dialog = EditSoundDialog(sound_data, self.config.get('groups', []), self, choke_groups); old_fields = self.registry.indexed_fields(sound_data)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             updated_data = dialog.get_updated_sound_data() # Returns original dict if changed, else None
             if updated_data:
                 print(f"Saving updated properties for {sound_data['id']}");
                 # Data was modified in-place by the dialog's accept method
-                self.save_config();
-                self.populate_groups_and_sounds(); # Refresh UI (group might have changed)
+                self.registry.update(sound_data, old_fields); self.save_config();
+                self.config_changed.emit("sounds") # Renames or moves the button (group might have changed)
                 # Hotkeys don't change here, no need to re-setup unless group logic affects it? No.
             else: print("Edit cancelled or no changes made.")
         else: print("Edit properties dialog cancelled.")
@@ -1869,7 +3569,8 @@ class SoundboardWindow(QMainWindow):
             else:
                 # Apply the change
                 print(f"Applying hotkey '{new_hotkey_canonical or 'None'}' to sound {sound_data['id']}");
-                sound_data['hotkey'] = new_hotkey_canonical # Update the live config dict
+                old_fields = self.registry.indexed_fields(sound_data); sound_data['hotkey'] = new_hotkey_canonical # Update the live config dict
+                self.registry.update(sound_data, old_fields)
                 self.save_config(); # Save changes
                 self.setup_hotkeys() # Rebuild map and restart listener with new/cleared hotkey
                 self.update_status(f"Hotkey for '{sound_data.get('name')}' set to '{new_hotkey_canonical or 'None'}'.")
@@ -1955,25 +3656,19 @@ class SoundboardWindow(QMainWindow):
         self._stop_hotkey_listener() # Stop listening for hotkeys
 
         if self.file_check_timer.isActive(): print("Stopping file check timer."); self.file_check_timer.stop()
+        self.file_watcher.stop()
 
-        print("Signaling active playback threads to stop..."); self.stop_all_sounds() # Signal threads
-
-        print("Waiting briefly for playback threads..."); start_wait = time.time(); join_timeout = 0.5 # Short timeout per thread
-        # Iterate over a copy, as threads remove themselves from the list
-        threads_to_wait_for = list(self.active_playback_threads)
-        waited_count = 0
-        # Give threads a chance to exit gracefully after being signaled
-        # Don't explicitly join here, rely on them being daemons and the stop_event
-        # wait briefly instead
-        max_wait_time = 1.0 # Max total wait time
-        while self.active_playback_threads and (time.time() - start_wait) < max_wait_time:
-            time.sleep(0.05)
+        self.preloader.cancel() # Stop warming the cache
+        self.import_prober.cancel() # An unfinished import adds nothing
+        print("Stopping playback..."); self.stop_all_sounds()
+        still_running = self.playback_pool.shutdown(timeout=1.0) # Workers finish the sound they are preparing, then exit
+        if still_running: print(f"Warn: {still_running} playback workers still busy after shutdown wait.")
+        else: print("All playback workers stopped.")
 
-        active_threads_final = list(self.active_playback_threads) # Check again
-        if active_threads_final: print(f"Warn: {len(active_threads_final)} playback threads might still be active after shutdown wait.")
-        else: print("All playback threads stopped or finished.")
+        print("Closing mixer output streams..."); self.audio_engine.close()
+        DISK_CACHE.close() # Let queued cache writes finish
 
-        self.save_config(); # Save current state
+        self.write_config_now(); self.config_writer.close() # Save current state, waiting for the write to land
         print("Soundboard App Finished.")
 
 